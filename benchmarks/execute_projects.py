@@ -0,0 +1,120 @@
+"""Scaling benchmark for InstallerService.execute_projects against a simulated system.
+
+    python -m benchmarks.execute_projects                 # compare with baseline.json
+    python -m benchmarks.execute_projects --update-baseline
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from laravel_installer.config import StateStore
+from laravel_installer.constants import DEFAULT_MAX_PARALLEL_PROJECTS
+from laravel_installer.installer import InstallerService
+from laravel_installer.mirrors import MirrorCache
+from laravel_installer.models import ProjectConfig
+from laravel_installer.runlog import RunLogStore
+
+from .fakes import FakeCommandRunner, FakeInspector, FakePrivileged, Latency, SimulatedSystem
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+DEFAULT_SIZES = (1, 10, 100, 1000)
+COUNTERS = ("subprocesses", "privileged_round_trips", "reloads")
+# Absolute wall-time slack so millisecond-sized runs do not fail on scheduler noise.
+WALL_SLACK_SECONDS = 0.25
+
+
+def run_benchmark(size: int, workdir: Path, scale: float = 0.001, max_workers: int = DEFAULT_MAX_PARALLEL_PROJECTS) -> dict:
+    """Install ``size`` projects on a fresh simulated system, then rerun the same batch unchanged."""
+    system = SimulatedSystem()
+    latency = Latency(scale)
+    runner = FakeCommandRunner(system, latency)
+    service = InstallerService(
+        runner=runner,
+        inspector=FakeInspector(system),
+        privileged=FakePrivileged(system, latency),
+        state=StateStore(workdir / "state.json"),
+        mirrors=MirrorCache(runner, root=workdir / "mirrors"),
+        run_logs=RunLogStore(workdir / "runs"),
+    )
+    base_dir = workdir / "www"
+    base_dir.mkdir(parents=True, exist_ok=True)
+    projects = [
+        ProjectConfig(name=f"app{index:04d}", repo_url=f"git@example.com:team/app{index:04d}.git", hostname="", target_dir="")
+        for index in range(size)
+    ]
+    report: dict[str, dict[str, float]] = {}
+    for phase in ("cold", "warm"):
+        system.reset_counters()
+        started = time.perf_counter()
+        executions = service.execute_projects(projects, str(base_dir), lambda *_: None, max_workers=max_workers)
+        wall_seconds = time.perf_counter() - started
+        service.privileged.close()
+        failed = [execution.project.name for execution in executions if execution.failed]
+        if failed:
+            raise RuntimeError(f"{len(failed)} simulated project(s) failed, first: {failed[0]}")
+        report[phase] = {"wall_seconds": round(wall_seconds, 3), **{name: getattr(system, name) for name in COUNTERS}}
+    return report
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions against ``baseline``: any counter above it, or wall time beyond ``tolerance``."""
+    regressions = []
+    for size, phases in results.items():
+        for phase, metrics in phases.items():
+            expected = baseline.get(size, {}).get(phase)
+            if expected is None:
+                continue
+            for name in COUNTERS:
+                if metrics[name] > expected[name]:
+                    regressions.append(f"{size} projects/{phase}: {name} {metrics[name]} > baseline {expected[name]}")
+            limit = max(expected["wall_seconds"] * (1 + tolerance), expected["wall_seconds"] + WALL_SLACK_SECONDS)
+            if tolerance >= 0 and metrics["wall_seconds"] > limit:
+                regressions.append(
+                    f"{size} projects/{phase}: wall {metrics['wall_seconds']:.3f}s > {limit:.3f}s "
+                    f"(baseline {expected['wall_seconds']:.3f}s + {tolerance:.0%})"
+                )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--scale", type=float, default=0.001, help="real seconds per simulated second")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_PARALLEL_PROJECTS)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed wall-time growth; negative ignores wall time")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    results: dict[str, dict] = {}
+    print(f"{'projects':>8} {'run':>5} {'wall s':>9} {'subprocs':>9} {'priv rt':>8} {'reloads':>8}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory(prefix="laravel-installer-bench-") as tmp:
+            results[str(size)] = run_benchmark(size, Path(tmp), args.scale, args.workers)
+        for phase, metrics in results[str(size)].items():
+            print(
+                f"{size:>8} {phase:>5} {metrics['wall_seconds']:>9.3f} {metrics['subprocesses']:>9} "
+                f"{metrics['privileged_round_trips']:>8} {metrics['reloads']:>8}"
+            )
+
+    if args.update_baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else {}
+        baseline.update(results)
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else {}
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import json
+import math
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+from laravel_installer.models import CommandResult
+from laravel_installer.system import CommandRunner, EnvironmentInspector, PrivilegedOperations
+
+# Log-normal latency per simulated operation: (median seconds, sigma).
+LATENCIES: dict[str, tuple[float, float]] = {
+    "git_clone": (2.5, 0.6),
+    "git_pull": (0.8, 0.5),
+    "git_rev_parse": (0.004, 0.3),
+    "composer_install": (18.0, 0.5),
+    "apt_install": (25.0, 0.4),
+    "pkexec_auth": (0.6, 0.3),
+    "helper_op": (0.003, 0.4),
+    "apache_configtest": (0.25, 0.3),
+    "apache_reload": (0.4, 0.3),
+}
+REVISION = "0123456789abcdef0123456789abcdef01234567"
+
+
+class Latency:
+    """Seeded latency source; ``scale`` shrinks simulated seconds into real sleeps (0 disables sleeping)."""
+
+    def __init__(self, scale: float = 0.001, seed: int = 1) -> None:
+        self.scale = scale
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self, kind: str) -> None:
+        if self.scale <= 0:
+            return
+        median, sigma = LATENCIES[kind]
+        with self._lock:
+            seconds = self._random.lognormvariate(math.log(median), sigma)
+        time.sleep(seconds * self.scale)
+
+
+class SimulatedSystem:
+    """The machine state the fakes read and mutate, plus the counters a benchmark reports."""
+
+    def __init__(self, php_constraint: str = "^8.3") -> None:
+        self.php_constraint = php_constraint
+        self.lock = threading.Lock()
+        self.packages: set[str] = {"git", "composer", "apache2", "pkexec"}
+        self.hosts: set[str] = {"localhost"}
+        self.sites: dict[str, str] = {}
+        self.enabled_sites: set[str] = set()
+        self.links: dict[str, str] = {}
+        self.owners: dict[str, str] = {}
+        self.apache_php: set[str] = set()
+        self.session_open = False
+        self.reset_counters()
+
+    def reset_counters(self) -> None:
+        self.subprocesses = 0
+        self.privileged_round_trips = 0
+        self.reloads = 0
+
+    def count_subprocess(self) -> None:
+        with self.lock:
+            self.subprocesses += 1
+
+    def php_versions(self) -> list[str]:
+        return sorted({package[3:].removesuffix("-cli") for package in self.packages if package.endswith("-cli")})
+
+
+class FakeCommandRunner(CommandRunner):
+    """git and composer that only touch the files the installer later reads."""
+
+    def __init__(self, system: SimulatedSystem, latency: Latency) -> None:
+        super().__init__()
+        self.system = system
+        self.latency = latency
+
+    def run(
+        self,
+        command: list[str],
+        cwd: Path | None = None,
+        check: bool = True,
+        on_output: Callable[[str], None] | None = None,
+        timeout: float | None = None,
+        resource: str | None = None,
+    ) -> CommandResult:
+        self.system.count_subprocess()
+        stdout = ""
+        if command[:2] == ["git", "clone"]:
+            self.latency.wait("git_clone")
+            self._clone(Path(command[-1]))
+            stdout = f"Cloning into '{command[-1]}'..."
+        elif command[-2:] == ["rev-parse", "HEAD"]:
+            self.latency.wait("git_rev_parse")
+            stdout = f"{REVISION}\n"
+        elif command[-1] == "pull":
+            self.latency.wait("git_pull")
+            stdout = "Already up to date."
+        elif "install" in command:
+            self.latency.wait("composer_install")
+            self._composer_install(Path(command[command.index("--working-dir") + 1]))
+            stdout = "Generating optimized autoload files"
+        else:
+            raise ValueError(f"Unexpected command: {command}")
+        if on_output is not None:
+            on_output(stdout.strip())
+        return CommandResult(command=command, returncode=0, stdout=stdout, stderr="")
+
+    def _clone(self, project_dir: Path) -> None:
+        (project_dir / "public").mkdir(parents=True)
+        (project_dir / "composer.json").write_text(
+            json.dumps({"require": {"php": self.system.php_constraint}}), encoding="utf-8"
+        )
+        (project_dir / "composer.lock").write_text('{"packages": []}', encoding="utf-8")
+        (project_dir / ".env.example").write_text("APP_ENV=local\n", encoding="utf-8")
+
+    def _composer_install(self, project_dir: Path) -> None:
+        installed = project_dir / "vendor" / "composer" / "installed.json"
+        installed.parent.mkdir(parents=True, exist_ok=True)
+        installed.write_text('{"packages": []}', encoding="utf-8")
+
+
+class FakeInspector(EnvironmentInspector):
+    """In-process reads of the simulated system; no subprocesses, like the real observers."""
+
+    def __init__(self, system: SimulatedSystem) -> None:
+        self.system = system
+
+    def preflight_snapshot(self) -> dict[str, object]:
+        return {
+            "git": "git" in self.system.packages,
+            "composer": "composer" in self.system.packages,
+            "apache2": "apache2" in self.system.packages,
+            "pkexec": "pkexec" in self.system.packages,
+            "php_versions": self.system.php_versions(),
+            "ubuntu_version": "24.04",
+        }
+
+    def installed_php_versions(self) -> list[str]:
+        return self.system.php_versions()
+
+    def installed_packages(self) -> frozenset[str]:
+        return frozenset(self.system.packages)
+
+    def invalidate(self) -> None:
+        pass
+
+    def hosts_entries(self) -> set[str]:
+        return set(self.system.hosts)
+
+    def site_config(self, site_name: str) -> str:
+        return self.system.sites.get(site_name, "")
+
+    def site_enabled(self, site_name: str) -> bool:
+        return site_name in self.system.enabled_sites
+
+    def apache_php_configured(self, php_version: str) -> bool:
+        return php_version in self.system.apache_php
+
+    def symlink_target(self, path: Path) -> str:
+        return self.system.links.get(str(path), "")
+
+    def path_owner(self, path: Path) -> str:
+        return self.system.owners.get(str(path), "")
+
+
+class FakePrivileged(PrivilegedOperations):
+    """A ``privileged_helper serve`` session: pkexec authenticates once, then each request is a round trip."""
+
+    def __init__(self, system: SimulatedSystem, latency: Latency) -> None:
+        self.system = system
+        self.latency = latency
+        self._lock = threading.Lock()
+
+    def run_operation(self, operation: str, payload: dict[str, object]) -> CommandResult:
+        with self._lock:
+            self.system.privileged_round_trips += 1
+            if not self.system.session_open:
+                self.system.count_subprocess()
+                self.latency.wait("pkexec_auth")
+                self.system.session_open = True
+            if operation == "run_operations":
+                result: object = [self._apply(str(item["operation"]), item["payload"]) for item in payload["operations"]]
+            else:
+                result = self._apply(operation, payload)
+        return CommandResult(command=["helper", operation], returncode=0, stdout=json.dumps(result), stderr="")
+
+    def close(self) -> None:
+        with self._lock:
+            self.system.session_open = False
+
+    def _apply(self, operation: str, payload: dict[str, object]) -> object:
+        system = self.system
+        self.latency.wait("helper_op")
+        if operation == "install_packages":
+            self.latency.wait("apt_install")
+            system.packages.update(payload["packages"])
+            return {"apt_update_skipped": False}
+        if operation == "ensure_directory_owner":
+            Path(payload["path"]).mkdir(parents=True, exist_ok=True)
+            return None
+        if operation == "link_public_dir":
+            target = str(Path(payload["source"]).resolve())
+            changed = system.links.get(str(payload["destination"])) != target
+            system.links[str(payload["destination"])] = target
+            return {"changed": changed}
+        if operation == "set_permissions":
+            system.owners[str(payload["path"])] = "www-data"
+            return {"scanned": 250, "changed": 250}
+        if operation == "write_vhost":
+            changed = system.sites.get(payload["site_name"]) != payload["content"]
+            system.sites[payload["site_name"]] = payload["content"]
+            return {"changed": changed}
+        if operation == "enable_site":
+            changed = payload["site_name"] not in system.enabled_sites
+            system.enabled_sites.add(payload["site_name"])
+            return {"changed": changed}
+        if operation == "sync_hosts_entries":
+            added = sorted(set(payload["hostnames"]) - system.hosts)
+            system.hosts.update(added)
+            return {"changed": bool(added), "added": added, "removed": []}
+        if operation == "configure_apache_php":
+            versions = set(payload.get("php_versions") or [payload.get("php_version")])
+            changed = not versions <= system.apache_php
+            system.apache_php.update(versions)
+            return {"changed": changed}
+        if operation == "apache_configtest":
+            self.latency.wait("apache_configtest")
+            return None
+        if operation == "ensure_service_running":
+            return None
+        if operation == "reload_apache":
+            self.latency.wait("apache_reload")
+            system.reloads += 1
+            return None
+        raise ValueError(f"Unsupported operation: {operation}")
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from .config import ConfigStore
+from .installer import InstallerService
+from .models import AppConfig, ProjectConfig
+from .trace import write_chrome_trace
+
+LEVEL_PREFIXES = {"error": "error: ", "success": "ok: ", "cmd": "  | ", "info": ""}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="laravel-installer", description="Install Laravel projects on Ubuntu.")
+    parser.add_argument("--manifest", type=Path, help="JSON manifest in config.json format instead of the saved config")
+    parser.add_argument("--base-dir", help="base directory for projects without an explicit target")
+    subcommands = parser.add_subparsers(dest="command")
+    subcommands.add_parser("plan", help="show the preflight summary without changing anything")
+    for name, help_text in (("run", "install the queued projects"), ("retry", "resume the projects that failed last time")):
+        command = subcommands.add_parser(name, help=help_text)
+        command.add_argument("projects", nargs="*", help="limit the run to these project names")
+        command.add_argument("--jobs", type=int, help="projects to install in parallel")
+        command.add_argument("--force", action="store_true", help="redo every step even when inputs are unchanged")
+    subcommands.add_parser("status", help="show the outcome of each project's last run")
+    trace = subcommands.add_parser("trace", help="export a run log as a Chrome trace timeline")
+    trace.add_argument("run_log", nargs="?", type=Path, help="run log to export (default: the latest run)")
+    trace.add_argument("-o", "--output", type=Path, default=Path("trace.json"))
+    subcommands.add_parser("gui", help="open the desktop interface (default)")
+    return parser
+
+
+def main(argv: list[str] | None = None, installer: InstallerService | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command in (None, "gui"):
+        from .main import run_gui
+
+        run_gui()
+        return 0
+    try:
+        config = load_config(args.manifest)
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+    base_dir = args.base_dir or config.default_base_dir
+    installer = installer or InstallerService()
+    try:
+        if args.command == "plan":
+            print(installer.build_preflight_summary(config.projects, base_dir))
+            return 0
+        if args.command == "status":
+            print_status(installer, config.projects)
+            return 0
+        if args.command == "trace":
+            return export_trace(installer, args.run_log, args.output)
+        return run_projects(installer, config, base_dir, args)
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+    finally:
+        installer.privileged.close()
+
+
+def load_config(manifest: Path | None) -> AppConfig:
+    if manifest is None:
+        return ConfigStore().load()
+    if not manifest.is_file():
+        raise ValueError(f"Manifest not found: {manifest}")
+    # An explicit manifest is parsed strictly: falling back to an empty config would silently install nothing.
+    try:
+        data = json.loads(manifest.read_text(encoding="utf-8"))
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object")
+        return AppConfig.from_dict(data)
+    except (OSError, TypeError, ValueError) as exc:
+        raise ValueError(f"Invalid manifest {manifest}: {exc}") from exc
+
+
+def run_projects(installer: InstallerService, config: AppConfig, base_dir: str, args: argparse.Namespace) -> int:
+    projects = config.projects
+    if args.command == "retry":
+        failed = set(installer.state.failed_projects())
+        projects = [project for project in projects if project.name in failed]
+    if args.projects:
+        unknown = set(args.projects) - {project.name for project in config.projects}
+        if unknown:
+            raise ValueError(f"Unknown project(s): {', '.join(sorted(unknown))}")
+        projects = [project for project in projects if project.name in args.projects]
+    if not projects:
+        print("Nothing to do.")
+        return 0
+    executions = installer.execute_projects(
+        projects,
+        base_dir,
+        print_log,
+        max_workers=max(1, args.jobs or config.max_parallel_projects),
+        force=args.force,
+        resume=args.command == "retry",
+        apt_lists_max_age=config.apt_lists_max_age,
+    )
+    failed_names = [execution.project.name for execution in executions if execution.failed]
+    if failed_names:
+        print(f"error: failed: {', '.join(failed_names)}", file=sys.stderr)
+        return 1
+    print(f"All {len(executions)} project(s) finished successfully.")
+    return 0
+
+
+def print_status(installer: InstallerService, projects: list[ProjectConfig]) -> None:
+    width = max((len(project.name) for project in projects), default=0)
+    for project in projects:
+        steps = installer.state.checkpoint(project.name)
+        failed = [result for result in steps.values() if result.status == "failed"]
+        if not steps:
+            status = "not run"
+        elif failed:
+            status = f"failed: {failed[-1].summary.splitlines()[0] if failed[-1].summary else failed[-1].step}"
+        else:
+            status = f"ok ({len(steps)} steps, last: {list(steps)[-1]})"
+        print(f"{project.name.ljust(width)}  {status}")
+
+
+def export_trace(installer: InstallerService, run_log: Path | None, output: Path) -> int:
+    if run_log is None:
+        runs = installer.run_logs.runs()
+        if not runs:
+            raise ValueError("No run logs recorded yet.")
+        run_log = runs[0]
+    elif not run_log.is_file():
+        raise ValueError(f"Run log not found: {run_log}")
+    count = write_chrome_trace(installer.run_logs.read(run_log), output)
+    print(f"Wrote {count} trace events from {run_log.name} to {output}")
+    return 0
+
+
+def print_log(message: str, level: str = "info") -> None:
+    stream = sys.stderr if level == "error" else sys.stdout
+    print(f"{LEVEL_PREFIXES.get(level, '')}{message}", file=stream, flush=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
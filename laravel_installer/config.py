@@ -1,10 +1,14 @@
 from __future__ import annotations
 
 import json
+import os
+import tempfile
+import threading
 from pathlib import Path
+from typing import Any, TextIO
 
-from .constants import CONFIG_DIR, CONFIG_PATH
-from .models import AppConfig
+from .constants import CONFIG_DIR, CONFIG_PATH, STATE_PATH
+from .models import AppConfig, StepResult
 
 
 class ConfigStore:
@@ -25,3 +29,166 @@ class ConfigStore:
         self.path.parent.mkdir(parents=True, exist_ok=True)
         with self.path.open("w", encoding="utf-8") as handle:
             json.dump(config.to_dict(), handle, indent=2)
+
+
+class StateStore:
+    """Per-project step fingerprints and checkpoints remembered between runs.
+
+    ``projects`` maps ``project -> step -> fingerprint`` and ``checkpoints``
+    keeps the latest StepResult of every step, so a retry can resume where the
+    previous run stopped. Each change is appended as one line to a journal next
+    to the state file, so recording a step costs the same however large the
+    state is. Loading replays the journal and folds it into the state file,
+    and ``compact`` does the same at the end of a batch.
+    """
+
+    def __init__(self, path: Path = STATE_PATH) -> None:
+        self.path = path
+        self.journal_path = path.with_name(f"{path.name}.journal")
+        self._lock = threading.Lock()
+        self._fingerprints: dict[str, dict[str, str]] | None = None
+        self._checkpoints: dict[str, dict[str, dict[str, Any]]] = {}
+        self._journal: TextIO | None = None
+
+    def fingerprint(self, project_name: str, step: str) -> str:
+        with self._lock:
+            return self._load().get(project_name, {}).get(step, "")
+
+    def record(self, project_name: str, step: str, fingerprint: str) -> None:
+        with self._lock:
+            if self._load().get(project_name, {}).get(step) == fingerprint:
+                return
+            self._commit({"op": "record", "project": project_name, "step": step, "fingerprint": fingerprint})
+
+    def forget(self, project_name: str, step: str | None = None) -> None:
+        with self._lock:
+            steps = self._load().get(project_name)
+            if steps is None or (step is not None and step not in steps):
+                return
+            self._commit({"op": "forget", "project": project_name, "step": step})
+
+    def checkpoint(self, project_name: str) -> dict[str, StepResult]:
+        with self._lock:
+            self._load()
+            steps = self._checkpoints.get(project_name, {})
+            return {step: StepResult.from_dict(data) for step, data in steps.items()}
+
+    def record_step(self, result: StepResult) -> None:
+        entry = {"op": "step", "result": result.to_dict()}
+        with self._lock:
+            self._load()
+            self._commit(entry)
+
+    def clear_checkpoint(self, project_name: str, step: str | None = None) -> None:
+        with self._lock:
+            self._load()
+            steps = self._checkpoints.get(project_name)
+            if steps is None or (step is not None and step not in steps):
+                return
+            self._commit({"op": "clear", "project": project_name, "step": step})
+
+    def failed_projects(self) -> list[str]:
+        with self._lock:
+            self._load()
+            return [
+                name
+                for name, steps in self._checkpoints.items()
+                if any(step.get("status") == "failed" for step in steps.values())
+            ]
+
+    def compact(self) -> None:
+        """Fold the journal into the state file."""
+        with self._lock:
+            self._load()
+            self._compact()
+
+    def _load(self) -> dict[str, dict[str, str]]:
+        if self._fingerprints is None:
+            try:
+                with self.path.open("r", encoding="utf-8") as handle:
+                    raw = json.load(handle)
+            except (json.JSONDecodeError, OSError):
+                raw = {}
+            if not isinstance(raw, dict):
+                raw = {}
+            self._fingerprints = {
+                str(name): {str(step): str(value) for step, value in steps.items()}
+                for name, steps in raw.get("projects", {}).items()
+                if isinstance(steps, dict)
+            }
+            self._checkpoints = {
+                str(name): {str(step): dict(result) for step, result in steps.items() if isinstance(result, dict)}
+                for name, steps in raw.get("checkpoints", {}).items()
+                if isinstance(steps, dict)
+            }
+            if self._replay_journal():
+                self._compact()
+        return self._fingerprints
+
+    def _replay_journal(self) -> bool:
+        """Apply the journal on top of the loaded state, skipping a line cut short by a crash."""
+        try:
+            with self.journal_path.open("r", encoding="utf-8") as handle:
+                lines = handle.readlines()
+        except OSError:
+            return False
+        if not lines:
+            return False
+        for line in lines:
+            try:
+                entry = json.loads(line)
+                self._apply(entry)
+            except (json.JSONDecodeError, AttributeError, KeyError, TypeError):
+                continue
+        return True
+
+    def _commit(self, entry: dict[str, Any]) -> None:
+        self._apply(entry)
+        if self._journal is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Line buffered: every entry reaches the file as soon as it is written.
+            self._journal = self.journal_path.open("a", encoding="utf-8", buffering=1)
+        self._journal.write(json.dumps(entry) + "\n")
+
+    def _apply(self, entry: dict[str, Any]) -> None:
+        operation = entry["op"]
+        if operation == "record":
+            self._fingerprints.setdefault(str(entry["project"]), {})[str(entry["step"])] = str(entry["fingerprint"])
+        elif operation == "forget":
+            self._discard(self._fingerprints, str(entry["project"]), entry["step"])
+        elif operation == "step":
+            result = dict(entry["result"])
+            steps = self._checkpoints.setdefault(str(result["project_name"]), {})
+            steps.pop(str(result["step"]), None)
+            steps[str(result["step"])] = result
+        elif operation == "clear":
+            self._discard(self._checkpoints, str(entry["project"]), entry["step"])
+
+    @staticmethod
+    def _discard(mapping: dict[str, dict[str, Any]], project_name: str, step: str | None) -> None:
+        if step is None:
+            mapping.pop(project_name, None)
+        elif project_name in mapping:
+            mapping[project_name].pop(str(step), None)
+
+    def _compact(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        elif not self.journal_path.exists():
+            return
+        self._write()
+        # One store owns a state file at a time: lines another process appended since this store loaded
+        # are not in the snapshot just written, so truncating the journal drops them.
+        os.truncate(self.journal_path, 0)
+
+    def _write(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=self.path.parent, prefix=".state-", suffix=".json")
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as temp:
+                json.dump({"projects": self._fingerprints, "checkpoints": self._checkpoints}, temp, indent=2)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
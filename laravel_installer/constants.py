@@ -16,10 +16,37 @@ COLOR_TEXT_DIM = "#a1a1a1"
 
 CONFIG_DIR = Path.home() / ".config" / APP_SLUG
 CONFIG_PATH = CONFIG_DIR / "config.json"
+STATE_PATH = CONFIG_DIR / "state.json"
+RUN_LOG_DIR = CONFIG_DIR / "runs"
+RUN_LOG_KEEP = 20
+APACHE_STATE_KEY = "_apache"
+MIRROR_CACHE_DIR = Path.home() / ".cache" / APP_SLUG / "mirrors"
 DEFAULT_BASE_DIR = Path("/var/www")
 DEFAULT_HOST_SUFFIX = ".test"
 DEFAULT_HTML_DIR = Path("/var/www/html")
+DPKG_STATUS_PATH = Path("/var/lib/dpkg/status")
+APACHE_DIR = Path("/etc/apache2")
+HOSTS_PATH = Path("/etc/hosts")
+BIN_DIR = Path("/usr/bin")
+OS_RELEASE_PATH = Path("/etc/os-release")
 SUPPORTED_UBUNTU_VERSIONS = ("22.04", "24.04")
+DEFAULT_MAX_PARALLEL_PROJECTS = 3
+# apt-get update is skipped while the package lists are younger than this many seconds.
+DEFAULT_APT_LISTS_MAX_AGE = 3600
+SUMMARY_DEBOUNCE_MS = 250
+QUEUE_VISIBLE_ROWS = 5
+DEFAULT_LOG_MAX_LINES = 5000
+LOG_POLL_ACTIVE_MS = 50
+LOG_POLL_IDLE_MS = 500
+LOG_BATCH_LIMIT = 2000
+# Concurrent commands per resource class (the executable name); others are unlimited.
+COMMAND_LIMITS = {"git": 16, "composer": 8}
+COMMAND_KILL_GRACE_SECONDS = 5.0
+COMMAND_READ_CHUNK = 65536
+CLI_IMPORT_BUDGET_MS = 250
+GUI_IMPORT_BUDGET_MS = 800
+FIRST_PAINT_BUDGET_MS = 2000
+STARTUP_PROBE_ENV = "LARAVEL_INSTALLER_STARTUP_PROBE"
 
 PHP_EXTENSIONS_REQUIRED = (
     "bcmath",
@@ -33,6 +60,29 @@ PHP_EXTENSIONS_REQUIRED = (
     "zip",
 )
 
+APACHE_PHP_MODULES = (
+    "proxy_fcgi",
+    "setenvif",
+    "rewrite",
+)
+
+# set_permissions only makes these project subtrees web-server writable, and never walks the excluded ones.
+PERMISSION_WRITABLE_PATHS = (
+    "storage",
+    "bootstrap/cache",
+)
+
+PERMISSION_EXCLUDE_PATHS = (
+    "vendor",
+    "node_modules",
+)
+
+APACHE_PUBLISH_STEPS = (
+    "public_link",
+    "vhost",
+    "site_enable",
+)
+
 SYSTEM_PACKAGES = (
     "git",
     "composer",
@@ -1,16 +1,41 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import os
 import shutil
+import threading
+import time
+from collections import deque
+from functools import partial
 from pathlib import Path
 
 from packaging.version import InvalidVersion, Version
 
-from .constants import DEFAULT_HTML_DIR, PHP_EXTENSIONS_REQUIRED, SYSTEM_PACKAGES, SUPPORTED_UBUNTU_VERSIONS
-from .models import ProjectConfig, ProjectExecution, StepResult
+from .config import StateStore
+from .constants import (
+    APACHE_PUBLISH_STEPS,
+    APACHE_STATE_KEY,
+    DEFAULT_APT_LISTS_MAX_AGE,
+    DEFAULT_HTML_DIR,
+    PERMISSION_EXCLUDE_PATHS,
+    PERMISSION_WRITABLE_PATHS,
+    PHP_EXTENSIONS_REQUIRED,
+    SYSTEM_PACKAGES,
+    SUPPORTED_UBUNTU_VERSIONS,
+)
+from .models import CommandResult, ProjectConfig, ProjectExecution, StepResult
 from .system import CommandRunner, EnvironmentInspector, PrivilegedOperations
-from .utils import normalize_hostname, normalize_target_dir, slugify_project_name, summarize_output
+from .mirrors import MirrorCache
+from .runlog import RunLog, RunLogStore
+from .scheduler import StepScheduler, Task
+from .utils import (
+    normalize_clone_filter,
+    normalize_hostname,
+    normalize_target_dir,
+    slugify_project_name,
+    summarize_output,
+)
 
 
 class InstallerService:
@@ -19,10 +44,19 @@ class InstallerService:
         runner: CommandRunner | None = None,
         inspector: EnvironmentInspector | None = None,
         privileged: PrivilegedOperations | None = None,
+        state: StateStore | None = None,
+        mirrors: MirrorCache | None = None,
+        run_logs: RunLogStore | None = None,
     ) -> None:
         self.runner = runner or CommandRunner()
         self.inspector = inspector or EnvironmentInspector(self.runner)
         self.privileged = privileged or PrivilegedOperations()
+        self.state = state or StateStore()
+        self.mirrors = mirrors or MirrorCache(self.runner)
+        self.run_logs = run_logs or RunLogStore()
+        self._run_log: RunLog | None = None
+        self._apt_lists_max_age = DEFAULT_APT_LISTS_MAX_AGE
+        self._clock_local = threading.local()
 
     def validate_project(self, project: ProjectConfig, default_base_dir: str) -> ProjectConfig:
         project_name = slugify_project_name(project.name)
@@ -32,12 +66,17 @@ class InstallerService:
         target_dir = normalize_target_dir(project.target_dir, project_name, default_base_dir)
         if not project.repo_url.strip():
             raise ValueError("Repository URL is required.")
+        if project.clone_depth < 0:
+            raise ValueError("Clone depth must be zero or a positive number.")
         return ProjectConfig(
             name=project_name,
             repo_url=project.repo_url.strip(),
             hostname=hostname,
             target_dir=str(target_dir),
             enabled=project.enabled,
+            clone_depth=project.clone_depth,
+            clone_filter=normalize_clone_filter(project.clone_filter),
+            use_mirror=project.use_mirror,
         )
 
     def build_preflight_summary(self, projects: list[ProjectConfig], default_base_dir: str) -> str:
@@ -134,39 +173,167 @@ class InstallerService:
         projects: list[ProjectConfig],
         default_base_dir: str,
         log_callback,
+        max_workers: int = 1,
+        force: bool = False,
+        resume: bool = False,
+        apt_lists_max_age: int = DEFAULT_APT_LISTS_MAX_AGE,
     ) -> list[ProjectExecution]:
+        """Install every project and return one ProjectExecution per project, in queue order.
+
+        ``force`` ignores stored fingerprints and redoes every step. ``resume``
+        continues from each project's last checkpoint: steps that completed in
+        the previous attempt are skipped as long as their inputs are unchanged.
+        ``apt_lists_max_age`` is how old, in seconds, the apt package lists may
+        be before installing packages runs ``apt-get update`` first.
+        Every run is recorded as structured events in ``self.run_logs``.
+        """
+        run_log = self._run_log = self.run_logs.start()
+        self._apt_lists_max_age = apt_lists_max_age
+        run_log.emit("run_start", projects=[project.name for project in projects], force=force, resume=resume)
         executions: list[ProjectExecution] = []
+        try:
+            executions = self._execute_batch(
+                projects, default_base_dir, self._logged(log_callback), max_workers, force, resume
+            )
+            return executions
+        finally:
+            run_log.emit("run_end", failed=[execution.project.name for execution in executions if execution.failed])
+            self._run_log = None
+            run_log.close()
+            self.state.compact()
+
+    def _execute_batch(
+        self,
+        projects: list[ProjectConfig],
+        default_base_dir: str,
+        log_callback,
+        max_workers: int,
+        force: bool,
+        resume: bool,
+    ) -> list[ProjectExecution]:
         snapshot = self.inspector.preflight_snapshot()
         missing_system = self.required_system_packages(snapshot)
         apt_packages = [pkg for pkg in missing_system if not pkg.startswith("Unsupported")]
         if apt_packages:
             log_callback("Installing missing system packages via pkexec...", "info")
-            self.privileged.install_packages(apt_packages)
-        for project in projects:
-            valid = self.validate_project(project, default_base_dir)
-            execution = ProjectExecution(project=valid)
-            executions.append(execution)
-            log_callback(f"Starting {valid.name}", "info")
-            try:
-                self._execute_project(valid, execution, log_callback)
-            except Exception as exc:
-                execution.steps.append(
-                    StepResult(
-                        project_name=valid.name,
-                        step="project",
-                        status="failed",
-                        summary=str(exc),
-                        stderr=str(exc),
-                        retryable=True,
-                        user_action_required="Review logs and retry the failed project.",
-                    )
-                )
-                log_callback(f"{valid.name}: {exc}", "error")
+            self._install_packages(apt_packages, log_callback)
+        executions = [
+            ProjectExecution(project=self.validate_project(project, default_base_dir)) for project in projects
+        ]
+        resume = resume and not force
+        for execution in executions:
+            if resume:
+                self.state.clear_checkpoint(execution.project.name, "project")
+            else:
+                self.state.clear_checkpoint(execution.project.name)
+            log_callback(f"{'Resuming' if resume else 'Starting'} {execution.project.name}", "info")
+        # apt and Apache work run beside up to max_workers network/CPU-bound steps.
+        scheduler = StepScheduler(
+            {"network": max_workers, "cpu": max_workers, "apt": 1, "apache": 1}, max_workers=max_workers + 2
+        )
+        scheduler.run(self.plan_steps(executions, log_callback, force, resume))
         return executions
 
-    def _execute_project(self, project: ProjectConfig, execution: ProjectExecution, log_callback) -> None:
+    def plan_steps(self, executions: list[ProjectExecution], log_callback, force: bool, resume: bool) -> list[Task]:
+        """The install as a step graph: each project's chain, joined by one finalize step.
+
+        Within a project nothing is published until composer succeeded, so a
+        project with broken dependencies never gets an enabled site. Across
+        projects only the declared resources limit concurrency: a clone can
+        overlap another project's composer install, and apt runs beside
+        unrelated composer installs.
+        """
+        prepared: deque[ProjectExecution] = deque()
+        tasks: list[Task] = []
+        for execution in executions:
+            name = execution.project.name
+            step = partial(self._project_step, execution, log_callback=log_callback)
+            tasks.extend(
+                [
+                    Task(
+                        f"{name}:source",
+                        partial(self._source_step, execution, prepared, log_callback, resume),
+                        (),
+                        ("network",),
+                    ),
+                    Task(
+                        f"{name}:php_packages",
+                        partial(self._php_packages_step, prepared, log_callback),
+                        (f"{name}:source",),
+                        ("apt",),
+                    ),
+                    Task(
+                        f"{name}:dependencies",
+                        step(partial(self._install_dependencies, force=force)),
+                        (f"{name}:php_packages",),
+                        ("network", "cpu"),
+                    ),
+                    Task(f"{name}:site", step(partial(self._publish_site, force=force)), (f"{name}:dependencies",), ("apache",)),
+                    Task(f"{name}:permissions", step(partial(self._publish_permissions, force=force)), (f"{name}:dependencies",)),
+                ]
+            )
+        published = tuple(task.key for task in tasks if task.key.endswith((":site", ":permissions")))
+        tasks.append(Task("finalize", partial(self._finalize_batch, executions, log_callback, force=force), published, ("apache",)))
+        return tasks
+
+    def _project_step(self, execution: ProjectExecution, phase, log_callback):
+        def run() -> None:
+            if not execution.failed:
+                self._run_project_phase(execution, phase, log_callback)
+
+        return run
+
+    def _source_step(self, execution: ProjectExecution, prepared: deque[ProjectExecution], log_callback, resume: bool) -> None:
+        self._run_project_phase(execution, partial(self._prepare_source, resume=resume), log_callback)
+        if not execution.failed:
+            prepared.append(execution)
+
+    def _php_packages_step(self, prepared: deque[ProjectExecution], log_callback) -> None:
+        # Group commit: whichever project gets the apt lock installs packages for
+        # every project whose source is ready by then, so apt usually runs once.
+        ready: list[ProjectExecution] = []
+        while prepared:
+            ready.append(prepared.popleft())
+        if ready:
+            self._install_php_packages(ready, log_callback)
+
+    def _run_project_phase(self, execution: ProjectExecution, phase, log_callback) -> None:
+        project = execution.project
+        name = getattr(getattr(phase, "func", phase), "__name__", "phase").lstrip("_")
+        self._emit("phase_start", project=project.name, phase=name)
+        self._start_step_clock(execution)
+        try:
+            phase(project, execution, log_callback)
+        except Exception as exc:
+            self._record_failure(execution, exc)
+            log_callback(f"{project.name}: {exc}", "error")
+        self._emit("phase_end", project=project.name, phase=name, failed=execution.failed)
+
+    def _record_failure(self, execution: ProjectExecution, exc: Exception) -> None:
+        started_at, finished_at = self._advance_step_clock(execution)
+        result = StepResult(
+            project_name=execution.project.name,
+            step="project",
+            status="failed",
+            summary=str(exc),
+            stderr=str(exc),
+            retryable=True,
+            user_action_required="Review logs and retry the failed project.",
+            started_at=started_at,
+            finished_at=finished_at,
+        )
+        execution.steps.append(result)
+        self.state.record_step(result)
+        self._emit("step", **result.to_dict())
+
+    def _prepare_source(
+        self,
+        project: ProjectConfig,
+        execution: ProjectExecution,
+        log_callback,
+        resume: bool = False,
+    ) -> None:
         project_dir = Path(project.target_dir)
-        html_dir = DEFAULT_HTML_DIR / project.name
         username = self._current_username()
 
         if not project_dir.exists():
@@ -180,8 +347,14 @@ class InstallerService:
                     ]
                 )
                 self._record(execution, "prepare_directory", "completed", f"Prepared writable directory {project_dir}")
-            result = self.runner.run(["git", "clone", project.repo_url, str(project_dir)])
-            self._record(execution, "git_clone", "completed", "Repository cloned.", result.stdout, result.stderr)
+            mirror = None
+            if project.use_mirror:
+                mirror = self.mirrors.update(project.repo_url, on_output=self._output_logger(project, log_callback))
+                self._record(execution, "git_mirror", "completed", f"Updated local mirror {mirror}")
+            result = self._run_command(project, self.clone_command(project, project_dir, mirror), log_callback, "git")
+            self._record(execution, "git_clone", "completed", "Repository cloned.", result.stdout, result.stderr, result)
+            execution.revision = self._source_revision(project_dir)
+            self.state.record(project.name, "source", self._source_fingerprint(project, execution.revision))
         else:
             if not os.access(project_dir, os.W_OK):
                 self.privileged.run_operations(
@@ -193,8 +366,15 @@ class InstallerService:
                     ]
                 )
                 self._record(execution, "prepare_directory", "completed", f"Reclaimed write access to {project_dir}")
-            result = self.runner.run(["git", "-C", str(project_dir), "pull"])
-            self._record(execution, "git_pull", "completed", "Repository updated.", result.stdout, result.stderr)
+            revision = self._source_revision(project_dir) if resume else ""
+            if resume and self._can_resume(project, ("git_clone", "git_pull"), "source", self._source_fingerprint(project, revision)):
+                execution.revision = revision
+                self._record(execution, "git_pull", "skipped", "Resumed: repository already prepared by the previous attempt.")
+            else:
+                result = self._run_command(project, ["git", "-C", str(project_dir), "pull"], log_callback, "git")
+                self._record(execution, "git_pull", "completed", "Repository updated.", result.stdout, result.stderr, result)
+                execution.revision = self._source_revision(project_dir)
+                self.state.record(project.name, "source", self._source_fingerprint(project, execution.revision))
         log_callback(f"{project.name}: source ready", "success")
 
         env_example = project_dir / ".env.example"
@@ -203,109 +383,421 @@ class InstallerService:
             shutil.copy2(env_example, env_file)
             self._record(execution, "env", "completed", ".env created from .env.example")
 
-        php_version = self.detect_php_version(project_dir / "composer.json")
+        execution.php_version = self.detect_php_version(project_dir / "composer.json")
+
+    def _install_php_packages(self, executions: list[ProjectExecution], log_callback) -> None:
+        """Install the PHP packages of every ready project in one apt transaction."""
+        planned = [execution for execution in executions if not execution.failed]
         installed_versions = self.inspector.installed_php_versions()
-        required_php_packages = [
-            *self.base_php_packages_for_version(php_version),
-            *self.extension_packages_for_php(php_version),
+        packages: list[str] = []
+        needs_install: list[ProjectExecution] = []
+        for php_version in sorted({execution.php_version for execution in planned}, key=Version):
+            required_php_packages = [
+                *self.base_php_packages_for_version(php_version),
+                *self.extension_packages_for_php(php_version),
+            ]
+            missing_php_packages = [package for package in required_php_packages if self._is_package_missing(package)]
+            if php_version not in installed_versions or missing_php_packages:
+                packages.extend(missing_php_packages or required_php_packages)
+                needs_install.extend(execution for execution in planned if execution.php_version == php_version)
+        if not packages:
+            return
+        log_callback(f"Installing PHP packages for {len(needs_install)} project(s) in one apt run...", "info")
+        started_at = time.time()
+        for execution in needs_install:
+            self._start_step_clock(execution, started_at)
+        try:
+            self._install_packages(packages, log_callback)
+        except Exception as exc:
+            for execution in needs_install:
+                self._record_failure(execution, exc)
+                log_callback(f"{execution.project.name}: {exc}", "error")
+            return
+        for execution in needs_install:
+            self._record(execution, "php_packages", "completed", f"Installed PHP runtime packages for {execution.php_version}")
+
+    def _install_packages(self, packages: list[str], log_callback) -> None:
+        try:
+            result = self.privileged.install_packages(packages, lists_max_age=self._apt_lists_max_age)
+        finally:
+            self.inspector.invalidate()
+        report = self.privileged.operation_result(result)
+        if isinstance(report, dict) and report.get("apt_update_skipped"):
+            log_callback("Skipped apt-get update: package lists are fresh.", "info")
+
+    def _install_dependencies(
+        self, project: ProjectConfig, execution: ProjectExecution, log_callback, force: bool = False
+    ) -> None:
+        project_dir = Path(project.target_dir)
+        php_version = execution.php_version
+
+        self._record(execution, "php", "completed", f"Using PHP {php_version}")
+
+        current_fingerprint = self.composer_fingerprint(project_dir, php_version)
+        if not force and current_fingerprint and self.state.fingerprint(project.name, "composer") == current_fingerprint:
+            execution.composer_fingerprint = current_fingerprint
+            self._record(execution, "composer", "skipped", "composer.lock and vendor unchanged; skipped composer install.")
+            log_callback(f"{project.name}: composer install skipped (dependencies unchanged)", "info")
+        else:
+            php_bin = shutil.which(f"php{php_version}") or f"/usr/bin/php{php_version}"
+            composer_bin = shutil.which("composer") or "/usr/bin/composer"
+            self.state.forget(project.name, "composer")
+            result = self._run_command(
+                project, [php_bin, composer_bin, "install", "--working-dir", str(project_dir)], log_callback, "composer"
+            )
+            fingerprint = execution.composer_fingerprint = self.composer_fingerprint(project_dir, php_version)
+            if fingerprint:
+                self.state.record(project.name, "composer", fingerprint)
+            self._record(
+                execution,
+                "composer",
+                "completed",
+                "Composer dependencies installed.",
+                result.stdout,
+                result.stderr,
+                result,
+            )
+            log_callback(f"{project.name}: composer install finished", "success")
+
+    def _publish_site(self, project: ProjectConfig, execution: ProjectExecution, log_callback, force: bool = False) -> None:
+        self._publish(project, execution, force, APACHE_PUBLISH_STEPS)
+
+    def _publish_permissions(self, project: ProjectConfig, execution: ProjectExecution, log_callback, force: bool = False) -> None:
+        self._publish(project, execution, force, ("permissions",))
+
+    def _publish(
+        self,
+        project: ProjectConfig,
+        execution: ProjectExecution,
+        force: bool,
+        steps: tuple[str, ...],
+    ) -> None:
+        """Send only the privileged ``steps`` whose inputs or observed state changed.
+
+        Each step carries an input fingerprint that is stored in the state
+        ledger after a successful batch. A step is skipped when the fingerprint
+        matches the last run and the system still looks the way we left it.
+        """
+        project_dir = Path(project.target_dir)
+        html_dir = DEFAULT_HTML_DIR / project.name
+        public_dir = project_dir / "public"
+        vhost = self.render_vhost(project.hostname, html_dir, execution.php_version)
+        planned = []
+        if "public_link" in steps:
+            planned.append(
+                (
+                    "public_link",
+                    {"operation": "link_public_dir", "payload": {"source": str(public_dir), "destination": str(html_dir)}},
+                    str(public_dir),
+                    self.inspector.symlink_target(html_dir) == str(public_dir.resolve()),
+                    f"Linked {html_dir} to project public directory",
+                )
+            )
+        if "permissions" in steps:
+            username = self._current_username()
+            planned.append(
+                (
+                    "permissions",
+                    {
+                        "operation": "set_permissions",
+                        "payload": {
+                            "path": str(project_dir),
+                            "username": username,
+                            "writable_paths": list(PERMISSION_WRITABLE_PATHS),
+                            "exclude": list(PERMISSION_EXCLUDE_PATHS),
+                        },
+                    },
+                    self._permissions_fingerprint(execution, username),
+                    self.inspector.path_owner(project_dir) == "www-data",
+                    f"Updated permissions for {project_dir}",
+                )
+            )
+        if "vhost" in steps:
+            planned.append(
+                (
+                    "vhost",
+                    {"operation": "write_vhost", "payload": {"site_name": project.name, "content": vhost}},
+                    hashlib.sha256(vhost.encode("utf-8")).hexdigest(),
+                    self.inspector.site_config(project.name) == vhost,
+                    f"Wrote Apache site {project.name}.conf",
+                )
+            )
+        if "site_enable" in steps:
+            planned.append(
+                (
+                    "site_enable",
+                    {"operation": "enable_site", "payload": {"site_name": project.name}},
+                    project.name,
+                    self.inspector.site_enabled(project.name),
+                    f"Enabled Apache site {project.name}",
+                )
+            )
+        pending = [
+            (step, operation, fingerprint, summary)
+            for step, operation, fingerprint, observed, summary in planned
+            if force or not observed or not fingerprint or self.state.fingerprint(project.name, step) != fingerprint
+        ]
+        pending_steps = {step for step, *_ in pending}
+        operations = [operation for _, operation, _, _ in pending]
+        results: object = None
+        if operations:
+            for step in pending_steps:
+                self.state.forget(project.name, step)
+            results = self.privileged.operation_result(self.privileged.run_operations(operations))
+        for step, operation, fingerprint, observed, summary in planned:
+            if step not in pending_steps:
+                self._record(execution, step, "skipped", f"{summary} (unchanged)")
+                continue
+            index = operations.index(operation)
+            report = results[index] if isinstance(results, list) and len(results) > index else None
+            if step == "permissions" and isinstance(report, dict):
+                summary = f"{summary} ({report.get('changed', 0)} of {report.get('scanned', 0)} entries changed)"
+            # The helper reports whether Apache-facing steps really changed anything;
+            # a step that only confirmed the existing state does not need a reload.
+            if step in APACHE_PUBLISH_STEPS and not (isinstance(report, dict) and report.get("changed") is False):
+                self.state.forget(project.name, "apache_reload")
+            if fingerprint:
+                self.state.record(project.name, step, fingerprint)
+            self._record(execution, step, "completed", summary)
+        if set(steps) & set(APACHE_PUBLISH_STEPS):
+            # Only the site task decides about the reload; the permissions task runs beside it.
+            execution.apache_fingerprint = hashlib.sha256(f"{public_dir}\n{vhost}".encode("utf-8")).hexdigest()
+            execution.apache_changed = force or self.state.fingerprint(project.name, "apache_reload") != execution.apache_fingerprint
+
+    def _finalize_batch(self, executions: list[ProjectExecution], log_callback, force: bool = False) -> None:
+        """Write hosts entries, configure PHP-FPM and reload Apache once for the whole batch.
+
+        Projects only write their vhosts during the per-project phase. Here all
+        new hostnames go into /etc/hosts in one write, every PHP version is wired
+        up once, and a single graceful reload publishes all sites together.
+        """
+        ready = [execution for execution in executions if not execution.failed]
+        if not ready:
+            return
+        started_at = time.time()
+        for execution in ready:
+            self._start_step_clock(execution, started_at)
+        known_hosts = self.inspector.hosts_entries()
+        missing_hosts = [
+            execution for execution in ready
+            if force
+            or execution.project.hostname not in known_hosts
+            or self.state.fingerprint(execution.project.name, "hosts") != execution.project.hostname
         ]
-        missing_php_packages = [
-            package for package in required_php_packages
-            if not Path("/usr/bin/dpkg-query").exists() or self._is_package_missing(package)
+        versions = sorted({execution.php_version for execution in ready}, key=Version)
+        unconfigured = [
+            version for version in versions
+            if force
+            or self.state.fingerprint(APACHE_STATE_KEY, f"php{version}") != version
+            or not self.inspector.apache_php_configured(version)
         ]
-        php_batch_ops: list[dict[str, object]] = []
-        if php_version not in installed_versions or missing_php_packages:
-            php_batch_ops.append(
-                {
-                    "operation": "install_packages",
-                    "payload": {"packages": missing_php_packages or required_php_packages},
-                }
-            )
-            self._record(execution, "php_packages", "completed", f"Installed PHP runtime packages for {php_version}")
-            installed_versions = self.inspector.installed_php_versions()
-        php_batch_ops.append({"operation": "configure_apache_php", "payload": {"php_version": php_version}})
-        self.privileged.run_operations(php_batch_ops)
-        self._record(execution, "php", "completed", f"Using PHP {php_version}")
-        self._record(execution, "apache_php", "completed", f"Configured Apache for PHP {php_version}")
-
-        php_bin = shutil.which(f"php{php_version}") or f"/usr/bin/php{php_version}"
-        composer_bin = shutil.which("composer") or "/usr/bin/composer"
-        result = self.runner.run([php_bin, composer_bin, "install", "--working-dir", str(project_dir)])
-        self._record(
-            execution,
-            "composer",
-            "completed",
-            "Composer dependencies installed.",
-            result.stdout,
-            result.stderr,
-        )
-        log_callback(f"{project.name}: composer install finished", "success")
-
-        vhost = self.render_vhost(project.hostname, html_dir, php_version)
-        self.privileged.run_operations(
-            [
-                {
-                    "operation": "link_public_dir",
-                    "payload": {"source": str(project_dir / "public"), "destination": str(html_dir)},
-                },
-                {
-                    "operation": "set_permissions",
-                    "payload": {"path": str(project_dir), "username": username},
-                },
-                {
-                    "operation": "ensure_hosts_entry",
-                    "payload": {"hostname": project.hostname},
-                },
-                {
-                    "operation": "write_vhost",
-                    "payload": {"site_name": project.name, "content": vhost},
-                },
-                {
-                    "operation": "enable_site",
-                    "payload": {"site_name": project.name},
-                },
-                {
-                    "operation": "ensure_service_running",
-                    "payload": {"service_name": "apache2"},
-                },
-                {
-                    "operation": "reload_apache",
-                    "payload": {},
-                },
-            ]
-        )
-        self._record(execution, "public_link", "completed", f"Linked {html_dir} to project public directory")
-        self._record(execution, "permissions", "completed", f"Updated permissions for {project_dir}")
-        self._record(execution, "hosts", "completed", f"Added hosts entry for {project.hostname}")
-        self._record(execution, "vhost", "completed", f"Wrote Apache site {project.name}.conf")
-        self._record(execution, "site_enable", "completed", f"Enabled Apache site {project.name}")
-        self._record(execution, "apache_reload", "completed", "Reloaded Apache")
-        self._record(execution, "publish", "completed", f"Published at http://{project.hostname}")
-        log_callback(f"{project.name}: published at http://{project.hostname}", "success")
+        reload_needed = any(execution.apache_changed for execution in ready)
+        reload_operations = [
+            {"operation": "apache_configtest", "payload": {}},
+            {"operation": "ensure_service_running", "payload": {"service_name": "apache2"}},
+            {"operation": "reload_apache", "payload": {}},
+        ]
+        operations: list[dict[str, object]] = []
+        new_hosts = {execution.project.name for execution in missing_hosts}
+        if missing_hosts:
+            hostnames = sorted({execution.project.hostname for execution in missing_hosts})
+            operations.append({"operation": "sync_hosts_entries", "payload": {"hostnames": hostnames}})
+        if unconfigured:
+            operations.append(self._configure_php_operation(unconfigured))
+        if operations or reload_needed:
+            log_callback(f"Finalizing {len(ready)} project(s)...", "info")
+            try:
+                if reload_needed:
+                    self.privileged.run_operations([*operations, *reload_operations])
+                else:
+                    # Only hosts or the PHP wiring may be stale: reload only if the
+                    # helper actually had to enable something for Apache.
+                    report = self.privileged.operation_result(self.privileged.run_operations(operations))
+                    if unconfigured:
+                        result = report[-1] if isinstance(report, list) and report else None
+                        reload_needed = not (isinstance(result, dict) and result.get("changed") is False)
+                    if reload_needed:
+                        self.privileged.run_operations(reload_operations)
+            except Exception as exc:
+                for execution in ready:
+                    self._record_failure(execution, exc)
+                    log_callback(f"{execution.project.name}: {exc}", "error")
+                return
+            for version in unconfigured:
+                self.state.record(APACHE_STATE_KEY, f"php{version}", version)
+        for execution in ready:
+            project = execution.project
+            if project.name in new_hosts:
+                self.state.record(project.name, "hosts", project.hostname)
+                self._record(execution, "hosts", "completed", f"Added hosts entry for {project.hostname}")
+            else:
+                self._record(execution, "hosts", "skipped", f"Hosts entry for {project.hostname} already present")
+            if execution.php_version in unconfigured:
+                self._record(execution, "apache_php", "completed", f"Configured Apache for PHP {execution.php_version}")
+            else:
+                self._record(execution, "apache_php", "skipped", f"Apache already configured for PHP {execution.php_version}")
+            if reload_needed:
+                self.state.record(project.name, "apache_reload", execution.apache_fingerprint)
+                self._record(execution, "apache_reload", "completed", "Reloaded Apache")
+            else:
+                self._record(execution, "apache_reload", "skipped", "Apache configuration unchanged; reload skipped")
+            self._record(execution, "publish", "completed", f"Published at http://{project.hostname}")
+            log_callback(f"{project.name}: published at http://{project.hostname}", "success")
+
+    def _configure_php_operation(self, php_versions: list[str]) -> dict[str, object]:
+        return {"operation": "configure_apache_php", "payload": {"php_versions": php_versions}}
+
+    def _permissions_fingerprint(self, execution: ProjectExecution, username: str) -> str:
+        # Reuses the revision and composer hash the source and dependency steps already computed.
+        if not execution.composer_fingerprint or not execution.revision:
+            return ""
+        paths = ",".join(PERMISSION_WRITABLE_PATHS) + "|" + ",".join(PERMISSION_EXCLUDE_PATHS)
+        return hashlib.sha256(
+            f"{username}\n{execution.revision}\n{execution.composer_fingerprint}\n{paths}".encode("utf-8")
+        ).hexdigest()
+
+    def _source_revision(self, project_dir: Path) -> str:
+        result = self.runner.run(["git", "-C", str(project_dir), "rev-parse", "HEAD"], check=False)
+        return result.stdout.strip() if result.returncode == 0 else ""
+
+    def _source_fingerprint(self, project: ProjectConfig, revision: str) -> str:
+        return f"{project.repo_url}\n{revision}" if revision else ""
+
+    def _can_resume(self, project: ProjectConfig, steps: tuple[str, ...], ledger_step: str, fingerprint: str) -> bool:
+        """True when the previous attempt finished one of ``steps`` with the same inputs."""
+        if not fingerprint or self.state.fingerprint(project.name, ledger_step) != fingerprint:
+            return False
+        checkpoint = self.state.checkpoint(project.name)
+        return any(step in checkpoint and checkpoint[step].status in ("completed", "skipped") for step in steps)
+
+    def clone_command(self, project: ProjectConfig, project_dir: Path, mirror: Path | None = None) -> list[str]:
+        command = ["git", "clone"]
+        if project.clone_depth:
+            command.extend(["--depth", str(project.clone_depth)])
+        if project.clone_filter:
+            command.append(f"--filter={project.clone_filter}")
+        if mirror is not None:
+            # --dissociate copies the borrowed objects so the project keeps working
+            # even if the mirror cache is pruned later.
+            command.extend(["--reference", str(mirror), "--dissociate"])
+        command.extend([project.repo_url, str(project_dir)])
+        return command
+
+    def composer_fingerprint(self, project_dir: Path, php_version: str) -> str:
+        """Hash of composer.lock, the PHP version and the installed vendor tree.
+
+        Returns an empty string when the lock file or vendor/composer/installed.json
+        is missing, because then there is nothing trustworthy to compare against.
+        """
+        lock_file = project_dir / "composer.lock"
+        installed = project_dir / "vendor" / "composer" / "installed.json"
+        if not lock_file.is_file() or not installed.is_file():
+            return ""
+        digest = hashlib.sha256()
+        digest.update(f"php={php_version}\n".encode())
+        for path in (lock_file, installed):
+            digest.update(hashlib.sha256(path.read_bytes()).hexdigest().encode())
+        return digest.hexdigest()
 
     def render_vhost(self, hostname: str, document_root: Path, php_version: str) -> str:
         template_path = Path(__file__).with_name("templates") / "apache_vhost.conf"
         template = template_path.read_text(encoding="utf-8")
         return template.format(hostname=hostname, document_root=document_root, php_version=php_version)
 
+    def _run_command(
+        self, project: ProjectConfig, command: list[str], log_callback, resource: str | None = None
+    ) -> CommandResult:
+        self._emit("command", project=project.name, command=command)
+        result = self.runner.run(
+            command, check=False, on_output=self._output_logger(project, log_callback), resource=resource
+        )
+        self._emit(
+            "command_end",
+            project=project.name,
+            command=command,
+            returncode=result.returncode,
+            started_at=result.started_at,
+            finished_at=result.finished_at,
+            cpu_seconds=result.cpu_seconds,
+            max_rss_kb=result.max_rss_kb,
+        )
+        CommandRunner.check_result(result)
+        return result
+
+    def _output_logger(self, project: ProjectConfig, log_callback):
+        def on_output(line: str) -> None:
+            self._emit("output", project=project.name, line=line)
+            log_callback(f"{project.name}: {line}", "cmd")
+
+        return on_output
+
+    def _logged(self, log_callback):
+        """Wrap ``log_callback`` so status messages also land in the run log; command lines are logged as output."""
+
+        def callback(message: str, level: str = "info") -> None:
+            if level != "cmd":
+                self._emit("log", message=message, level=level)
+            log_callback(message, level)
+
+        return callback
+
+    def _emit(self, event: str, **fields) -> None:
+        run_log = self._run_log
+        if run_log is not None:
+            run_log.emit(event, **fields)
+
     def _current_username(self) -> str:
         return os.environ.get("SUDO_USER") or os.environ.get("USER") or "www-data"
 
     def _is_package_missing(self, package_name: str) -> bool:
-        try:
-            result = self.runner.run(["dpkg-query", "-W", "-f=${Status}", package_name], check=False)
-        except RuntimeError:
-            return True
-        return "install ok installed" not in result.stdout
-
-    def _record(self, execution: ProjectExecution, step: str, status: str, summary: str, stdout: str = "", stderr: str = "") -> None:
-        execution.steps.append(
-            StepResult(
-                project_name=execution.project.name,
-                step=step,
-                status=status,
-                summary=summary,
-                stdout=summarize_output(stdout),
-                stderr=summarize_output(stderr),
-            )
+        return not self.inspector.is_package_installed(package_name)
+
+    def _record(
+        self,
+        execution: ProjectExecution,
+        step: str,
+        status: str,
+        summary: str,
+        stdout: str = "",
+        stderr: str = "",
+        command: CommandResult | None = None,
+    ) -> None:
+        """Record a finished step; it started where the project's previous step ended.
+
+        ``command`` is the subprocess that did the step's work, whose CPU time
+        and peak RSS are attached to the result.
+        """
+        started_at, finished_at = self._advance_step_clock(execution)
+        result = StepResult(
+            project_name=execution.project.name,
+            step=step,
+            status=status,
+            summary=summary,
+            stdout=summarize_output(stdout),
+            stderr=summarize_output(stderr),
+            started_at=started_at,
+            finished_at=finished_at,
+            cpu_seconds=command.cpu_seconds if command else 0.0,
+            max_rss_kb=command.max_rss_kb if command else 0,
         )
+        execution.steps.append(result)
+        self.state.record_step(result)
+        self._emit("step", **{**result.to_dict(), "stdout": stdout, "stderr": stderr})
+
+    def _start_step_clock(self, execution: ProjectExecution, started_at: float | None = None) -> None:
+        self._step_clocks()[id(execution)] = started_at or time.time()
+
+    def _advance_step_clock(self, execution: ProjectExecution) -> tuple[float, float]:
+        """Start and end of the step being recorded; the next step starts where it ended."""
+        finished_at = time.time()
+        clocks = self._step_clocks()
+        started_at = clocks.get(id(execution), finished_at)
+        clocks[id(execution)] = finished_at
+        return started_at, finished_at
+
+    def _step_clocks(self) -> dict[int, float]:
+        # Per thread, because a project's site and dependency steps run concurrently.
+        clocks = getattr(self._clock_local, "clocks", None)
+        if clocks is None:
+            clocks = self._clock_local.clocks = {}
+        return clocks
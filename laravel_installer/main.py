@@ -1,27 +1,30 @@
 from __future__ import annotations
 
-import importlib
+import importlib.util
 import subprocess
 import sys
 
 
 def ensure_runtime_dependencies() -> None:
-    missing = []
-    for package in ("customtkinter", "packaging"):
-        try:
-            importlib.import_module(package)
-        except ImportError:
-            missing.append(package)
+    # find_spec only locates the package; the real import happens once, in ui.
+    missing = [package for package in ("customtkinter", "packaging") if importlib.util.find_spec(package) is None]
     if missing:
         subprocess.check_call([sys.executable, "-m", "pip", "install", *missing])
 
 
-def main() -> None:
+def run_gui() -> None:
     ensure_runtime_dependencies()
     from .ui import run_app
 
     run_app()
 
 
+def main(argv: list[str] | None = None) -> None:
+    # The CLI only pulls in Tk for the gui subcommand, which is also the default.
+    from .cli import main as cli_main
+
+    sys.exit(cli_main(argv))
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import hashlib
+import shutil
+import threading
+from pathlib import Path
+from typing import Callable
+
+from .constants import MIRROR_CACHE_DIR
+from .system import CommandRunner
+from .utils import slugify_project_name
+
+
+class MirrorCache:
+    """Bare ``git clone --mirror`` copies of upstream repositories.
+
+    Projects and branches that share an upstream clone with ``--reference`` to
+    the mirror, so only the first clone of a repository hits the network.
+    Every use fetches the mirror first so references never go stale.
+    """
+
+    def __init__(self, runner: CommandRunner | None = None, root: Path = MIRROR_CACHE_DIR) -> None:
+        self.runner = runner or CommandRunner()
+        self.root = root
+        self._locks: dict[Path, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def path_for(self, repo_url: str) -> Path:
+        digest = hashlib.sha1(repo_url.encode("utf-8")).hexdigest()[:12]
+        name = slugify_project_name(repo_url.rstrip("/").rsplit("/", 1)[-1].removesuffix(".git")) or "repo"
+        return self.root / f"{name}-{digest}.git"
+
+    def update(self, repo_url: str, on_output: Callable[[str], None] | None = None) -> Path:
+        path = self.path_for(repo_url)
+        with self._lock_for(path):
+            if (path / "HEAD").exists():
+                self.runner.run(["git", "--git-dir", str(path), "remote", "update", "--prune"], on_output=on_output)
+                return path
+            self.root.mkdir(parents=True, exist_ok=True)
+            partial = path.with_name(f"{path.name}.partial")
+            shutil.rmtree(partial, ignore_errors=True)
+            self.runner.run(["git", "clone", "--mirror", repo_url, str(partial)], on_output=on_output)
+            partial.rename(path)
+        return path
+
+    def _lock_for(self, path: Path) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(path, threading.Lock())
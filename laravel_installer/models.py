@@ -4,7 +4,15 @@ from dataclasses import asdict, dataclass, field
 from pathlib import Path
 from typing import Any
 
-from .constants import DEFAULT_BASE_DIR, DEFAULT_HOST_SUFFIX
+from .constants import DEFAULT_APT_LISTS_MAX_AGE, DEFAULT_BASE_DIR, DEFAULT_HOST_SUFFIX, DEFAULT_MAX_PARALLEL_PROJECTS
+
+
+def _as_int(value: Any, default: int) -> int:
+    """``value`` as an int, or ``default`` when a hand-edited config holds something else."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
 
 
 @dataclass
@@ -14,6 +22,9 @@ class ProjectConfig:
     hostname: str = ""
     target_dir: str = ""
     enabled: bool = True
+    clone_depth: int = 0
+    clone_filter: str = ""
+    use_mirror: bool = False
 
     def normalized_hostname(self) -> str:
         return self.hostname.strip() or f"{self.name}{DEFAULT_HOST_SUFFIX}"
@@ -32,6 +43,9 @@ class ProjectConfig:
             hostname=str(data.get("hostname", "")).strip(),
             target_dir=str(data.get("target_dir", "")).strip(),
             enabled=bool(data.get("enabled", True)),
+            clone_depth=max(0, _as_int(data.get("clone_depth"), 0)),
+            clone_filter=str(data.get("clone_filter", "")).strip(),
+            use_mirror=bool(data.get("use_mirror", False)),
         )
 
 
@@ -41,6 +55,8 @@ class AppConfig:
     default_base_dir: str = str(DEFAULT_BASE_DIR)
     last_used_php: str = ""
     ui_preferences: dict[str, Any] = field(default_factory=dict)
+    max_parallel_projects: int = DEFAULT_MAX_PARALLEL_PROJECTS
+    apt_lists_max_age: int = DEFAULT_APT_LISTS_MAX_AGE
 
     def to_dict(self) -> dict[str, Any]:
         return {
@@ -48,6 +64,8 @@ class AppConfig:
             "default_base_dir": self.default_base_dir,
             "last_used_php": self.last_used_php,
             "ui_preferences": self.ui_preferences,
+            "max_parallel_projects": self.max_parallel_projects,
+            "apt_lists_max_age": self.apt_lists_max_age,
         }
 
     @classmethod
@@ -58,6 +76,8 @@ class AppConfig:
             default_base_dir=str(data.get("default_base_dir", DEFAULT_BASE_DIR)),
             last_used_php=str(data.get("last_used_php", "")).strip(),
             ui_preferences=dict(data.get("ui_preferences", {})),
+            max_parallel_projects=max(1, _as_int(data.get("max_parallel_projects"), DEFAULT_MAX_PARALLEL_PROJECTS)),
+            apt_lists_max_age=max(0, _as_int(data.get("apt_lists_max_age"), DEFAULT_APT_LISTS_MAX_AGE)),
         )
 
 
@@ -67,6 +87,10 @@ class CommandResult:
     returncode: int
     stdout: str
     stderr: str
+    started_at: float = 0.0
+    finished_at: float = 0.0
+    cpu_seconds: float = 0.0
+    max_rss_kb: int = 0
 
 
 @dataclass
@@ -79,12 +103,45 @@ class StepResult:
     stderr: str = ""
     retryable: bool = False
     user_action_required: str = ""
+    started_at: float = 0.0
+    finished_at: float = 0.0
+    cpu_seconds: float = 0.0
+    max_rss_kb: int = 0
+
+    @property
+    def duration(self) -> float:
+        return max(0.0, self.finished_at - self.started_at)
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "StepResult":
+        return cls(
+            project_name=str(data.get("project_name", "")),
+            step=str(data.get("step", "")),
+            status=str(data.get("status", "")),
+            summary=str(data.get("summary", "")),
+            stdout=str(data.get("stdout", "")),
+            stderr=str(data.get("stderr", "")),
+            retryable=bool(data.get("retryable", False)),
+            user_action_required=str(data.get("user_action_required", "")),
+            started_at=float(data.get("started_at", 0.0) or 0.0),
+            finished_at=float(data.get("finished_at", 0.0) or 0.0),
+            cpu_seconds=float(data.get("cpu_seconds", 0.0) or 0.0),
+            max_rss_kb=int(data.get("max_rss_kb", 0) or 0),
+        )
 
 
 @dataclass
 class ProjectExecution:
     project: ProjectConfig
     steps: list[StepResult] = field(default_factory=list)
+    php_version: str = ""
+    revision: str = ""
+    composer_fingerprint: str = ""
+    apache_changed: bool = False
+    apache_fingerprint: str = ""
 
     @property
     def failed(self) -> bool:
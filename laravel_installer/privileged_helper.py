@@ -1,11 +1,31 @@
 from __future__ import annotations
 
+import grp
 import json
 import os
+import pwd
 import shutil
+import re
+import stat
 import subprocess
 import sys
+import tempfile
+import time
 from pathlib import Path
+from typing import TextIO
+
+from .constants import APACHE_DIR, APACHE_PHP_MODULES, DEFAULT_APT_LISTS_MAX_AGE, HOSTS_PATH
+
+
+APT_LISTS_DIR = Path("/var/lib/apt/lists")
+PROJECT_MODE = 0o775
+APACHE_STATE_DIR = Path("/var/lib/apache2")
+HOSTS_ADDRESS = "127.0.0.1"
+HOSTS_BLOCK_BEGIN = "# BEGIN laravel-installer managed hosts"
+HOSTS_BLOCK_END = "# END laravel-installer managed hosts"
+# Directory prefix in /etc/apache2 -> a2query state directory in /var/lib/apache2.
+APACHE_ITEM_KINDS = {"mods": "module", "sites": "site", "conf": "conf"}
+WEB_SERVER_USER = "www-data"
 
 
 def read_payload() -> dict[str, object]:
@@ -19,7 +39,14 @@ def run(command: list[str]) -> None:
     subprocess.run(command, check=True)
 
 
-def run_operations(payload: dict[str, object]) -> None:
+def run_captured(command: list[str]) -> subprocess.CompletedProcess[str]:
+    completed = subprocess.run(command, text=True, capture_output=True, check=False)
+    sys.stdout.write(completed.stdout)
+    sys.stderr.write(completed.stderr)
+    return completed
+
+
+def run_operations(payload: dict[str, object]) -> list[object]:
     operations = payload.get("operations", [])
     if not isinstance(operations, list):
         raise ValueError("operations must be a list")
@@ -32,55 +59,170 @@ def run_operations(payload: dict[str, object]) -> None:
             raise ValueError(f"unsupported batch operation: {operation}")
         if not isinstance(op_payload, dict):
             raise ValueError("payload must be an object")
-        OPERATIONS[operation](op_payload)
+    return [OPERATIONS[str(item.get("operation", "")).strip()](item.get("payload", {})) for item in operations]
+
+
+def apt_lists_age() -> float | None:
+    try:
+        return time.time() - APT_LISTS_DIR.stat().st_mtime
+    except OSError:
+        return None
+
 
+def packages_with_candidates(packages: list[str]) -> set[str]:
+    completed = subprocess.run(["apt-cache", "policy", *packages], text=True, capture_output=True, check=False)
+    available: set[str] = set()
+    current = ""
+    for line in completed.stdout.splitlines():
+        if line and not line[0].isspace() and line.endswith(":"):
+            current = line[:-1].strip()
+        elif current and line.strip().startswith("Candidate:"):
+            if line.split(":", 1)[1].strip() != "(none)":
+                available.add(current)
+    return available
 
-def install_packages(payload: dict[str, object]) -> None:
+
+def install_packages(payload: dict[str, object]) -> dict[str, object]:
     packages = payload.get("packages", [])
     if not isinstance(packages, list) or not all(isinstance(item, str) for item in packages):
         raise ValueError("packages must be a list of strings")
+    max_age = payload.get("lists_max_age", DEFAULT_APT_LISTS_MAX_AGE)
+    if isinstance(max_age, bool) or not isinstance(max_age, (int, float)):
+        raise ValueError("lists_max_age must be a number of seconds")
     if not packages:
-        return
-    run(["apt-get", "update"])
-    run(["apt-get", "install", "-y", *packages])
-
-
-def write_vhost(payload: dict[str, object]) -> None:
+        return {"apt_update_skipped": True}
+    age = apt_lists_age()
+    skip_update = age is not None and age <= max_age and packages_with_candidates(packages) >= set(packages)
+    if not skip_update:
+        run(["apt-get", "update"])
+    command = ["apt-get", "install", "-y", *packages]
+    completed = run_captured(command)
+    if completed.returncode != 0:
+        output = f"{completed.stdout}\n{completed.stderr}".lower()
+        if not skip_update or "unable to locate package" not in output:
+            raise subprocess.CalledProcessError(completed.returncode, command, completed.stdout, completed.stderr)
+        skip_update = False
+        run(["apt-get", "update"])
+        run(command)
+    return {"apt_update_skipped": skip_update}
+
+
+def write_vhost(payload: dict[str, object]) -> dict[str, bool]:
     site_name = str(payload.get("site_name", "")).strip()
     content = str(payload.get("content", ""))
     if not site_name or "/" in site_name:
         raise ValueError("invalid site name")
-    target = Path("/etc/apache2/sites-available") / f"{site_name}.conf"
+    target = APACHE_DIR / "sites-available" / f"{site_name}.conf"
+    try:
+        if target.read_text(encoding="utf-8") == content:
+            return {"changed": False}
+    except OSError:
+        pass
     target.write_text(content, encoding="utf-8")
+    return {"changed": True}
 
 
-def enable_site(payload: dict[str, object]) -> None:
+def enable_site(payload: dict[str, object]) -> dict[str, bool]:
     site_name = str(payload.get("site_name", "")).strip()
     if not site_name or "/" in site_name:
         raise ValueError("invalid site name")
-    run(["a2ensite", f"{site_name}.conf"])
+    return {"changed": enable_apache_item("sites", site_name)}
+
+
+def enable_apache_item(kind: str, name: str, _seen: set[str] | None = None) -> bool:
+    """Do what a2enmod/a2ensite/a2enconf do, without spawning them.
+
+    Creates the relative ``<kind>-enabled`` symlinks (``.load`` and ``.conf``
+    for modules), enables module dependencies declared with ``# Depends:``
+    first, and returns whether any link had to be created or repaired.
+    """
+    if kind not in APACHE_ITEM_KINDS:
+        raise ValueError(f"unsupported apache item kind: {kind}")
+    if not name or "/" in name or name.startswith("."):
+        raise ValueError(f"invalid apache {APACHE_ITEM_KINDS[kind]} name")
+    seen = _seen if _seen is not None else set()
+    if name in seen:
+        return False
+    seen.add(name)
+    available = APACHE_DIR / f"{kind}-available"
+    enabled = APACHE_DIR / f"{kind}-enabled"
+    if kind == "mods":
+        files = [f"{name}.load", f"{name}.conf"]
+        if not (available / files[0]).exists():
+            raise ValueError(f"apache module does not exist: {name}")
+    else:
+        files = [f"{name}.conf"]
+        if not (available / files[0]).exists():
+            raise ValueError(f"apache {APACHE_ITEM_KINDS[kind]} does not exist: {name}")
+
+    changed = False
+    if kind == "mods":
+        for dependency in module_dependencies(available / f"{name}.load"):
+            changed |= enable_apache_item(kind, dependency, seen)
+    for filename in files:
+        if not (available / filename).exists():
+            continue
+        link = enabled / filename
+        target = f"../{kind}-available/{filename}"
+        if link.is_symlink() and os.readlink(link) == target:
+            continue
+        if link.is_symlink() or link.exists():
+            link.unlink()
+        enabled.mkdir(parents=True, exist_ok=True)
+        os.symlink(target, link)
+        changed = True
+    if changed:
+        mark_enabled_by_admin(kind, name)
+    return changed
+
+
+def module_dependencies(load_file: Path) -> list[str]:
+    dependencies: list[str] = []
+    for line in load_file.read_text(encoding="utf-8").splitlines():
+        stripped = line.strip()
+        if stripped.lower().startswith("# depends:"):
+            dependencies.extend(stripped.split(":", 1)[1].replace(",", " ").split())
+    return dependencies
+
+
+def mark_enabled_by_admin(kind: str, name: str) -> None:
+    # a2query and the apache2 maintainer scripts read these markers to keep
+    # admin choices across package upgrades, exactly as a2enmod leaves them.
+    state = APACHE_STATE_DIR / APACHE_ITEM_KINDS[kind]
+    try:
+        (state / "disabled_by_admin" / name).unlink(missing_ok=True)
+        (state / "enabled_by_admin").mkdir(parents=True, exist_ok=True)
+        (state / "enabled_by_admin" / name).touch()
+    except OSError:
+        pass
 
 
 def reload_apache(_: dict[str, object]) -> None:
     run(["systemctl", "reload", "apache2"])
 
 
-def configure_apache_php(payload: dict[str, object]) -> None:
-    php_version = str(payload.get("php_version", "")).strip()
-    if not php_version:
+def configure_apache_php(payload: dict[str, object]) -> dict[str, bool]:
+    versions = payload.get("php_versions")
+    if versions is None:
+        versions = [str(payload.get("php_version", "")).strip()]
+    if not isinstance(versions, list) or not all(isinstance(item, str) and item.strip() for item in versions):
         raise ValueError("php_version is required")
 
-    modules = ["proxy_fcgi", "setenvif", "rewrite"]
-    for module in modules:
-        run(["a2enmod", module])
+    changed = False
+    for module in APACHE_PHP_MODULES:
+        changed |= enable_apache_item("mods", module)
 
-    php_fpm_conf = f"php{php_version}-fpm"
-    conf_path = Path("/etc/apache2/conf-available") / f"{php_fpm_conf}.conf"
-    if conf_path.exists():
-        run(["a2enconf", php_fpm_conf])
-
-    run(["systemctl", "enable", "--now", f"php{php_version}-fpm"])
+    for php_version in versions:
+        php_fpm_conf = f"php{php_version.strip()}-fpm"
+        if (APACHE_DIR / "conf-available" / f"{php_fpm_conf}.conf").exists():
+            changed |= enable_apache_item("conf", php_fpm_conf)
+        run(["systemctl", "enable", "--now", php_fpm_conf])
     run(["systemctl", "enable", "--now", "apache2"])
+    return {"changed": changed}
+
+
+def apache_configtest(_: dict[str, object]) -> None:
+    run(["apachectl", "configtest"])
 
 
 def ensure_service_running(payload: dict[str, object]) -> None:
@@ -90,38 +232,194 @@ def ensure_service_running(payload: dict[str, object]) -> None:
     run(["systemctl", "enable", "--now", service_name])
 
 
-def ensure_hosts_entry(payload: dict[str, object]) -> None:
-    hostname = str(payload.get("hostname", "")).strip().lower()
-    if not hostname or any(char.isspace() for char in hostname):
+def ensure_hosts_entry(payload: dict[str, object]) -> dict[str, object]:
+    return sync_hosts_entries({"hostnames": [payload.get("hostname", "")]})
+
+
+def sync_hosts_entries(payload: dict[str, object]) -> dict[str, object]:
+    """Add hostnames to the installer-managed block of /etc/hosts in one atomic write.
+
+    With ``prune`` the block is replaced by exactly ``hostnames``, which drops
+    entries of projects that no longer exist. Lines outside the block are kept,
+    except bare ``127.0.0.1 <host>`` lines that older releases appended for a
+    host that is now managed in the block.
+    """
+    hostnames = payload.get("hostnames", [])
+    if not isinstance(hostnames, list):
+        raise ValueError("hostnames must be a list")
+    wanted = {validate_hostname(item) for item in hostnames}
+    prune = bool(payload.get("prune", False))
+
+    content = HOSTS_PATH.read_text(encoding="utf-8")
+    outside, managed = parse_hosts_block(content)
+    updated = wanted if prune else managed | wanted
+    outside = [line for line in outside if not is_legacy_hosts_line(line, updated)]
+    new_content = render_hosts(outside, updated)
+    if new_content == content:
+        return {"changed": False, "added": [], "removed": []}
+    replace_file_atomically(HOSTS_PATH, new_content)
+    return {"changed": True, "added": sorted(updated - managed), "removed": sorted(managed - updated)}
+
+
+def validate_hostname(value: object) -> str:
+    hostname = str(value).strip().lower()
+    if not hostname or not re.fullmatch(r"[a-z0-9.-]+", hostname):
         raise ValueError("invalid hostname")
-    hosts_path = Path("/etc/hosts")
-    content = hosts_path.read_text(encoding="utf-8")
-    expected = f"127.0.0.1 {hostname}"
-    if expected not in content:
-        with hosts_path.open("a", encoding="utf-8") as handle:
-            handle.write(f"\n{expected}\n")
+    return hostname
+
+
+def parse_hosts_block(content: str) -> tuple[list[str], set[str]]:
+    outside: list[str] = []
+    managed: set[str] = set()
+    inside = False
+    for line in content.splitlines():
+        stripped = line.strip()
+        if stripped == HOSTS_BLOCK_BEGIN:
+            inside = True
+        elif stripped == HOSTS_BLOCK_END:
+            inside = False
+        elif inside:
+            fields = stripped.split("#", 1)[0].split()
+            managed.update(field.lower() for field in fields[1:])
+        else:
+            outside.append(line)
+    return outside, managed
+
+
+def is_legacy_hosts_line(line: str, managed: set[str]) -> bool:
+    fields = line.split()
+    return len(fields) == 2 and fields[0] == HOSTS_ADDRESS and fields[1].lower() in managed
+
 
+def render_hosts(outside: list[str], managed: set[str]) -> str:
+    while outside and not outside[-1].strip():
+        outside = outside[:-1]
+    lines = list(outside)
+    if managed:
+        lines.extend(["", HOSTS_BLOCK_BEGIN, *(f"{HOSTS_ADDRESS} {hostname}" for hostname in sorted(managed)), HOSTS_BLOCK_END])
+    return "\n".join(lines) + "\n"
 
-def link_public_dir(payload: dict[str, object]) -> None:
+
+def replace_file_atomically(path: Path, content: str) -> None:
+    info = path.stat()
+    handle, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(handle, "w", encoding="utf-8") as temp:
+            temp.write(content)
+            temp.flush()
+            os.fsync(temp.fileno())
+        os.chmod(temp_path, stat.S_IMODE(info.st_mode))
+        if os.geteuid() == 0:
+            os.chown(temp_path, info.st_uid, info.st_gid)
+        os.replace(temp_path, path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+
+
+def link_public_dir(payload: dict[str, object]) -> dict[str, bool]:
     source = Path(str(payload.get("source", ""))).resolve()
     destination = Path(str(payload.get("destination", "")))
     if not source.exists():
         raise ValueError("public source does not exist")
+    if destination.is_symlink() and os.readlink(destination) == str(source):
+        return {"changed": False}
     if destination.is_symlink() or destination.exists():
         if destination.is_dir() and not destination.is_symlink():
             shutil.rmtree(destination)
         else:
             destination.unlink()
     os.symlink(source, destination)
+    return {"changed": True}
 
 
-def set_permissions(payload: dict[str, object]) -> None:
+def set_permissions(payload: dict[str, object]) -> dict[str, int]:
     path = Path(str(payload.get("path", "")))
-    username = str(payload.get("username", "")).strip() or "www-data"
+    username = str(payload.get("username", "")).strip() or WEB_SERVER_USER
     if not path.exists():
         raise ValueError("path does not exist")
-    run(["chmod", "-R", "775", str(path)])
-    run(["chown", "-R", f"www-data:{username}", str(path)])
+    exclude = relative_paths(payload.get("exclude", []), "exclude")
+    writable_paths = relative_paths(payload.get("writable_paths", []), "writable_paths")
+    try:
+        uid = pwd.getpwnam(WEB_SERVER_USER).pw_uid
+        gid = grp.getgrnam(username).gr_gid
+    except KeyError as exc:
+        raise ValueError(f"unknown user or group: {exc}") from exc
+    return fix_tree(path, uid, gid, PROJECT_MODE, exclude, writable_paths)
+
+
+def relative_paths(value: object, field: str) -> list[str]:
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"{field} must be a list of strings")
+    paths = [item.strip().strip("/") for item in value if item.strip().strip("/")]
+    if any(part == ".." for item in paths for part in item.split("/")):
+        raise ValueError(f"{field} must stay inside the project")
+    return paths
+
+
+def fix_tree(
+    root: Path,
+    uid: int,
+    gid: int,
+    mode: int,
+    exclude: list[str] | None = None,
+    writable_paths: list[str] | None = None,
+) -> dict[str, int]:
+    """Give every entry under ``root`` the wanted owner and mode, touching only mismatches.
+
+    Entries under ``exclude`` are skipped entirely. When ``writable_paths`` is
+    given, only the project root and those subtrees are visited. A symlink is
+    re-owned itself with ``lchown`` and never chmod-ed; the walk does not
+    follow it, and a writable path that is a symlink is skipped.
+    """
+    counts = {"scanned": 0, "changed": 0}
+    excluded = set(exclude or [])
+
+    def fix(path: str, info: os.stat_result) -> None:
+        counts["scanned"] += 1
+        changed = False
+        if stat.S_ISLNK(info.st_mode):
+            if info.st_uid != uid or info.st_gid != gid:
+                os.lchown(path, uid, gid)
+                changed = True
+        else:
+            if info.st_uid != uid or info.st_gid != gid:
+                os.chown(path, uid, gid)
+                changed = True
+            if stat.S_IMODE(info.st_mode) != mode:
+                os.chmod(path, mode)
+                changed = True
+        counts["changed"] += changed
+
+    def walk(top: str, rel: str) -> None:
+        stack = [(top, rel)]
+        while stack:
+            directory, directory_rel = stack.pop()
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    entry_rel = f"{directory_rel}/{entry.name}" if directory_rel else entry.name
+                    if entry_rel in excluded:
+                        continue
+                    fix(entry.path, entry.stat(follow_symlinks=False))
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, entry_rel))
+
+    fix(str(root), os.lstat(root))
+    if not root.is_dir():
+        return counts
+    if not writable_paths:
+        walk(str(root), "")
+        return counts
+    for rel in writable_paths:
+        if any(rel == item or rel.startswith(f"{item}/") for item in excluded):
+            continue
+        target = root / rel
+        if not target.exists() or target.is_symlink():
+            continue
+        fix(str(target), os.lstat(target))
+        if target.is_dir():
+            walk(str(target), rel)
+    return counts
 
 
 def ensure_directory_owner(payload: dict[str, object]) -> None:
@@ -140,27 +438,90 @@ OPERATIONS = {
     "enable_site": enable_site,
     "reload_apache": reload_apache,
     "ensure_hosts_entry": ensure_hosts_entry,
+    "sync_hosts_entries": sync_hosts_entries,
     "link_public_dir": link_public_dir,
     "set_permissions": set_permissions,
     "ensure_directory_owner": ensure_directory_owner,
     "configure_apache_php": configure_apache_php,
+    "apache_configtest": apache_configtest,
     "ensure_service_running": ensure_service_running,
     "run_operations": run_operations,
 }
 
 
+def dispatch(operation: str, payload: object) -> object:
+    if operation not in OPERATIONS:
+        raise ValueError(f"unsupported operation: {operation}")
+    if not isinstance(payload, dict):
+        raise ValueError("payload must be an object")
+    return OPERATIONS[operation](payload)
+
+
+def serve(requests: TextIO, responses: TextIO) -> None:
+    """Answer newline-delimited JSON requests until stdin closes.
+
+    Each request is ``{"id": ..., "operation": ..., "payload": {...}}`` and gets
+    exactly one ``{"id": ..., "ok": bool, "result": ..., "error": str}`` line
+    back. The loop ends
+    on EOF, which is what the client sees when the GUI or CLI exits.
+    """
+    for line in requests:
+        line = line.strip()
+        if not line:
+            continue
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be an object")
+            request_id = request.get("id")
+            operation = str(request.get("operation", "")).strip()
+            if operation == "shutdown":
+                break
+            result = dispatch(operation, request.get("payload", {}))
+            response = {"id": request_id, "ok": True, "result": result, "error": ""}
+        except Exception as exc:
+            response = {"id": request_id, "ok": False, "result": None, "error": str(exc)}
+        try:
+            responses.write(json.dumps(response) + "\n")
+            responses.flush()
+        except BrokenPipeError:
+            break
+
+
+def _reserve_stdout() -> TextIO:
+    # Keep the original stdout for JSON replies and send everything else written
+    # to fd 1 (apt-get, systemctl, a2enmod, ...) to stderr instead.
+    sys.stdout.flush()
+    responses = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    return responses
+
+
 def main() -> None:
     if len(sys.argv) < 2:
         raise SystemExit("operation required")
     operation = sys.argv[1]
-    if operation not in OPERATIONS:
+    if operation != "serve" and operation not in OPERATIONS:
         raise SystemExit(f"unsupported operation: {operation}")
-    payload = read_payload()
+    responses = _reserve_stdout()
     try:
-        OPERATIONS[operation](payload)
-    except Exception as exc:
-        print(str(exc), file=sys.stderr)
-        raise SystemExit(1) from exc
+        if operation == "serve":
+            serve(sys.stdin, responses)
+            return
+        payload = read_payload()
+        try:
+            result = OPERATIONS[operation](payload)
+        except Exception as exc:
+            print(str(exc), file=sys.stderr)
+            raise SystemExit(1) from exc
+        if result is not None:
+            responses.write(json.dumps(result) + "\n")
+    finally:
+        try:
+            responses.close()
+        except BrokenPipeError:
+            pass
 
 
 if __name__ == "__main__":
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import gzip
+import json
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from .constants import RUN_LOG_DIR, RUN_LOG_KEEP
+
+_CLOSE = object()
+
+
+class RunLog:
+    """JSONL event stream of one installer run.
+
+    ``emit`` only enqueues the event; a dedicated writer thread serializes and
+    appends it, so install workers never wait on the disk. ``close`` drains the
+    queue, then compresses the file to ``.jsonl.gz``.
+    """
+
+    def __init__(self, path: Path, on_close: Callable[[], None] | None = None) -> None:
+        self.path = path
+        self.run_id = path.name.removesuffix(".jsonl")
+        self._on_close = on_close
+        self._queue: queue.SimpleQueue[object] = queue.SimpleQueue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._write_events, name=f"runlog-{self.run_id}", daemon=True)
+        self._thread.start()
+
+    def emit(self, event: str, **fields: Any) -> None:
+        if not self._closed:
+            self._queue.put({"ts": time.time(), "event": event, **fields})
+
+    def close(self) -> Path:
+        """Flush pending events and return the path of the compressed log."""
+        if self._closed:
+            return self.path.with_name(f"{self.path.name}.gz")
+        self._closed = True
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        compressed = self.path.with_name(f"{self.path.name}.gz")
+        if self.path.exists():
+            with self.path.open("rb") as source, gzip.open(compressed, "wb") as target:
+                shutil.copyfileobj(source, target)
+            self.path.unlink()
+        if self._on_close is not None:
+            self._on_close()
+        return compressed
+
+    def _write_events(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as handle:
+            while True:
+                event = self._queue.get()
+                if event is _CLOSE:
+                    return
+                handle.write(json.dumps(event, default=str) + "\n")
+                # Flush once the burst is written so a crash loses little without a write per event.
+                if self._queue.empty():
+                    handle.flush()
+
+
+class RunLogStore:
+    """Directory of per-run logs, newest ``keep`` runs retained."""
+
+    def __init__(self, directory: Path = RUN_LOG_DIR, keep: int = RUN_LOG_KEEP) -> None:
+        self.directory = directory
+        self.keep = keep
+
+    def start(self) -> RunLog:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        return RunLog(self.directory / f"run-{stamp}.jsonl", on_close=self.rotate)
+
+    def runs(self) -> list[Path]:
+        """Run logs, newest first; an unfinished run shows up as plain ``.jsonl``."""
+        if not self.directory.is_dir():
+            return []
+        paths = [*self.directory.glob("run-*.jsonl"), *self.directory.glob("run-*.jsonl.gz")]
+        return sorted(paths, key=lambda path: path.name.removesuffix(".gz"), reverse=True)
+
+    def rotate(self) -> None:
+        for path in self.runs()[self.keep:]:
+            path.unlink(missing_ok=True)
+
+    def read(self, path: Path) -> Iterator[dict[str, Any]]:
+        """Yield the events of a run, skipping a line cut short by a crash."""
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rt", encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(event, dict):
+                    yield event
+
+    def replay(self, path: Path, log_callback: Callable[[str, str], None]) -> None:
+        """Send a past run to ``log_callback`` as the (message, level) pairs the UI showed live."""
+        for event in self.read(path):
+            kind = event.get("event")
+            if kind == "log":
+                log_callback(str(event.get("message", "")), str(event.get("level", "info")))
+            elif kind == "output":
+                log_callback(f"{event.get('project', '')}: {event.get('line', '')}", "cmd")
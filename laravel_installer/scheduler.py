@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import heapq
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable
+
+
+@dataclass(frozen=True)
+class Task:
+    key: str
+    run: Callable[[], None]
+    after: tuple[str, ...] = ()
+    resources: tuple[str, ...] = ()
+
+
+class StepScheduler:
+    """Run a dependency graph of tasks on a thread pool.
+
+    A task starts once every task in ``after`` has finished and one unit of
+    each of its ``resources`` is free; ``limits`` caps how many running tasks
+    may hold a resource at once. Among ready tasks the one added first starts
+    first. When a task raises, the tasks that depend on it are not run and the
+    first exception is re-raised after everything else has finished.
+    """
+
+    def __init__(self, limits: dict[str, int], max_workers: int) -> None:
+        self.limits = limits
+        self.max_workers = max(1, max_workers)
+
+    def run(self, tasks: list[Task]) -> None:
+        order = {task.key: index for index, task in enumerate(tasks)}
+        self._validate(tasks, order)
+        waiting = {task.key: len(set(task.after)) for task in tasks}
+        dependents: dict[str, list[str]] = {task.key: [] for task in tasks}
+        for task in tasks:
+            for dependency in set(task.after):
+                dependents[dependency].append(task.key)
+        # Ready tasks wait in one heap per resource set, so picking the next task
+        # looks at a handful of heap heads instead of every ready task.
+        ready: dict[tuple[str, ...], list[int]] = {}
+        in_use: Counter[str] = Counter()
+        failed: set[str] = set()
+        errors: list[BaseException] = []
+        running: dict[Future, Task] = {}
+
+        def push(index: int) -> None:
+            heapq.heappush(ready.setdefault(tasks[index].resources, []), index)
+
+        def finish(key: str) -> None:
+            for dependent in dependents[key]:
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    push(order[dependent])
+
+        for task in tasks:
+            if not task.after:
+                push(order[task.key])
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="installer") as pool:
+            while running or any(ready.values()):
+                while len(running) < self.max_workers:
+                    startable = [
+                        queue[0]
+                        for resources, queue in ready.items()
+                        if queue and all(in_use[resource] < self.limits[resource] for resource in resources)
+                    ]
+                    if not startable:
+                        break
+                    task = tasks[heapq.heappop(ready[tasks[min(startable)].resources])]
+                    if any(dependency in failed for dependency in task.after):
+                        failed.add(task.key)
+                        finish(task.key)
+                        continue
+                    in_use.update(task.resources)
+                    running[pool.submit(task.run)] = task
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    in_use.subtract(task.resources)
+                    if future.exception() is not None:
+                        failed.add(task.key)
+                        errors.append(future.exception())
+                    finish(task.key)
+        if errors:
+            raise errors[0]
+
+    def _validate(self, tasks: list[Task], order: dict[str, int]) -> None:
+        if len(order) != len(tasks):
+            raise ValueError("Task keys must be unique.")
+        for task in tasks:
+            unknown = [dependency for dependency in task.after if dependency not in order]
+            if unknown:
+                raise ValueError(f"Task {task.key} depends on unknown task(s): {', '.join(unknown)}")
+            for resource in task.resources:
+                if self.limits.get(resource, 0) < 1:
+                    raise ValueError(f"Task {task.key} needs resource {resource!r}, which has no capacity.")
+        remaining = {task.key: set(task.after) for task in tasks}
+        while remaining:
+            free = [key for key, dependencies in remaining.items() if not dependencies & remaining.keys()]
+            if not free:
+                raise ValueError(f"Task graph has a cycle through: {', '.join(sorted(remaining))}")
+            for key in free:
+                del remaining[key]
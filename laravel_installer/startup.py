@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from .constants import FIRST_PAINT_BUDGET_MS, GUI_IMPORT_BUDGET_MS, STARTUP_PROBE_ENV
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Cumulative ``-X importtime`` microseconds per module for ``import module`` in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line.split("|")
+        try:
+            times[fields[2].strip()] = int(fields[1])
+        except (IndexError, ValueError):
+            continue
+    return times
+
+
+def time_to_first_paint(timeout: float = 30.0) -> float | None:
+    """Milliseconds from launching the GUI until its first frame is drawn, or None without a display."""
+    if not os.environ.get("DISPLAY") and not os.environ.get("WAYLAND_DISPLAY"):
+        return None
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", "from laravel_installer.ui import run_app; run_app()"],
+        env={**os.environ, STARTUP_PROBE_ENV: "1"},
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        for line in process.stdout:
+            if line.strip() == "first-paint":
+                return (time.perf_counter() - started) * 1000
+        return None
+    finally:
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Report GUI import time and time to first paint.")
+    parser.add_argument("--module", default="laravel_installer.ui")
+    parser.add_argument("--import-budget-ms", type=float, default=GUI_IMPORT_BUDGET_MS)
+    parser.add_argument("--paint-budget-ms", type=float, default=FIRST_PAINT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--skip-paint", action="store_true")
+    args = parser.parse_args(argv)
+
+    times = import_times(args.module)
+    import_ms = times.get(args.module, 0) / 1000
+    print(f"import {args.module}: {import_ms:.1f} ms (budget {args.import_budget_ms:.0f} ms)")
+    for name, micros in sorted(times.items(), key=lambda item: item[1], reverse=True)[: args.top]:
+        print(f"  {micros / 1000:8.1f} ms  {name}")
+    over_budget = import_ms > args.import_budget_ms
+
+    if not args.skip_paint:
+        paint_ms = time_to_first_paint()
+        if paint_ms is None:
+            print("first paint: not measured (no display)")
+        else:
+            print(f"first paint: {paint_ms:.1f} ms (budget {args.paint_budget_ms:.0f} ms)")
+            over_budget = over_budget or paint_ms > args.paint_budget_ms
+    if over_budget:
+        print("startup budget exceeded", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,87 +1,512 @@
 from __future__ import annotations
 
+import asyncio
+import atexit
+import codecs
+import concurrent.futures
+import itertools
 import json
 import os
+import pwd
+import re
 import shutil
+import signal
 import subprocess
+import threading
+import time
+from collections import deque
 from pathlib import Path
-from typing import Iterable
+from resource import struct_rusage
+from typing import BinaryIO, Callable, Iterable
 
 from packaging.version import Version
 
+from .constants import (
+    APACHE_DIR,
+    APACHE_PHP_MODULES,
+    BIN_DIR,
+    COMMAND_KILL_GRACE_SECONDS,
+    COMMAND_LIMITS,
+    COMMAND_READ_CHUNK,
+    DPKG_STATUS_PATH,
+    HOSTS_PATH,
+    OS_RELEASE_PATH,
+)
 from .models import CommandResult
 from .utils import summarize_output
 
+_NEWLINES = re.compile(r"\r\n|\r|\n")
+
+
+class BoundedOutput:
+    """Keep the first and last lines of a stream and count what was dropped in between."""
+
+    def __init__(self, head_lines: int = 20, tail_lines: int = 80, max_line_length: int = 2000) -> None:
+        self.head_lines = head_lines
+        self.max_line_length = max_line_length
+        self._head: list[str] = []
+        self._tail: deque[str] = deque(maxlen=tail_lines)
+        self._omitted = 0
+
+    def append(self, line: str) -> None:
+        if len(line) > self.max_line_length:
+            line = line[: self.max_line_length - 3] + "..."
+        if len(self._head) < self.head_lines:
+            self._head.append(line)
+            return
+        if len(self._tail) == self._tail.maxlen:
+            self._omitted += 1
+        self._tail.append(line)
+
+    def getvalue(self) -> str:
+        lines = list(self._head)
+        if self._omitted:
+            lines.append(f"... {self._omitted} lines omitted ...")
+        lines.extend(self._tail)
+        return "\n".join(lines)
+
+
+class AsyncCommandRunner:
+    """Run commands as asyncio tasks, so a single thread can supervise many at once.
+
+    A command waits for the semaphore of its resource class (the executable
+    name unless ``resource`` is given), streams each output line to
+    ``on_output`` as it arrives, and is terminated, then killed, when it
+    exceeds ``timeout`` or its task is cancelled. The child is reaped with
+    ``wait4`` once its pidfd becomes readable, so its CPU time and peak RSS
+    are still reported. ``on_output`` runs on the event loop and must not block.
+    """
+
+    def __init__(self, limits: dict[str, int] | None = None, kill_grace: float = COMMAND_KILL_GRACE_SECONDS) -> None:
+        self.limits = dict(COMMAND_LIMITS if limits is None else limits)
+        self.kill_grace = kill_grace
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+    async def run(
+        self,
+        command: list[str],
+        cwd: Path | None = None,
+        check: bool = True,
+        on_output: Callable[[str], None] | None = None,
+        timeout: float | None = None,
+        resource: str | None = None,
+    ) -> CommandResult:
+        resource = resource or Path(command[0]).name
+        if resource in self.limits:
+            semaphore = self._semaphores.setdefault(resource, asyncio.Semaphore(self.limits[resource]))
+            async with semaphore:
+                result = await self._run(command, cwd, on_output, timeout)
+        else:
+            result = await self._run(command, cwd, on_output, timeout)
+        if check:
+            CommandRunner.check_result(result)
+        return result
+
+    async def _run(
+        self,
+        command: list[str],
+        cwd: Path | None,
+        on_output: Callable[[str], None] | None,
+        timeout: float | None,
+    ) -> CommandResult:
+        stdout = BoundedOutput()
+        stderr = BoundedOutput()
+        started_at = time.time()
+        process = subprocess.Popen(command, cwd=str(cwd) if cwd else None, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        exited = asyncio.ensure_future(self._wait(process.pid))
+        pumps = (self._pump(process.stdout, stdout, on_output), self._pump(process.stderr, stderr, on_output))
+        try:
+            # Shielded so that a timeout or cancellation only stops the readers; the child is still reaped.
+            await asyncio.wait_for(asyncio.gather(*pumps, asyncio.shield(exited)), timeout)
+        except asyncio.TimeoutError:
+            process.returncode = await self._stop(process.pid, exited)
+            raise RuntimeError(f"Command timed out after {timeout:g}s: {' '.join(command)}") from None
+        except asyncio.CancelledError:
+            process.returncode = await self._stop(process.pid, exited)
+            raise
+        _, status, usage = exited.result()
+        # Popen never reaped the child itself; tell it so it does not try to.
+        process.returncode = returncode = os.waitstatus_to_exitcode(status)
+        return CommandResult(
+            command=command,
+            returncode=returncode,
+            stdout=stdout.getvalue(),
+            stderr=stderr.getvalue(),
+            started_at=started_at,
+            finished_at=time.time(),
+            cpu_seconds=usage.ru_utime + usage.ru_stime,
+            max_rss_kb=usage.ru_maxrss,
+        )
+
+    async def _stop(self, pid: int, exited: asyncio.Future) -> int:
+        # Signal by pid: Popen.terminate() polls first and would reap the child behind wait4's back.
+        if not exited.done():
+            os.kill(pid, signal.SIGTERM)
+            try:
+                await asyncio.wait_for(asyncio.shield(exited), self.kill_grace)
+            except asyncio.TimeoutError:
+                os.kill(pid, signal.SIGKILL)
+        _, status, _ = await exited
+        return os.waitstatus_to_exitcode(status)
+
+    async def _wait(self, pid: int) -> tuple[int, int, struct_rusage]:
+        loop = asyncio.get_running_loop()
+        try:
+            pidfd = os.pidfd_open(pid)
+        except (AttributeError, OSError):
+            return await loop.run_in_executor(None, os.wait4, pid, 0)
+        readable = loop.create_future()
+        loop.add_reader(pidfd, lambda: readable.done() or readable.set_result(None))
+        try:
+            await readable
+        finally:
+            loop.remove_reader(pidfd)
+            os.close(pidfd)
+        return os.wait4(pid, 0)
+
+    async def _pump(self, pipe: BinaryIO, buffer: BoundedOutput, on_output: Callable[[str], None] | None) -> None:
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+        def emit(lines: list[str]) -> None:
+            for line in lines:
+                buffer.append(line)
+                if on_output is not None and line.strip():
+                    on_output(line)
+
+        pending = ""
+        try:
+            while chunk := await reader.read(COMMAND_READ_CHUNK):
+                pending += decoder.decode(chunk)
+                # A trailing "\r" may be the first half of "\r\n"; keep it for the next chunk.
+                held = "\r" if pending.endswith("\r") else ""
+                *lines, pending = _NEWLINES.split(pending.removesuffix("\r") if held else pending)
+                pending += held
+                emit(lines)
+            lines = _NEWLINES.split(pending + decoder.decode(b"", final=True))
+            emit(lines[:-1] if lines[-1] == "" else lines)
+        finally:
+            transport.close()
+
 
 class CommandRunner:
+    """Blocking facade over ``AsyncCommandRunner``.
+
+    Every command of this runner executes on one event-loop thread, started
+    on first use, and the calling thread waits for its result. ``cancel``
+    stops whatever is still running.
+    """
+
+    def __init__(self, engine: AsyncCommandRunner | None = None) -> None:
+        self.engine = engine or AsyncCommandRunner()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_lock = threading.Lock()
+        self._pending: set[concurrent.futures.Future] = set()
+
     def run(
         self,
         command: list[str],
         cwd: Path | None = None,
         check: bool = True,
+        on_output: Callable[[str], None] | None = None,
+        timeout: float | None = None,
+        resource: str | None = None,
     ) -> CommandResult:
-        completed = subprocess.run(
-            command,
-            cwd=str(cwd) if cwd else None,
-            text=True,
-            capture_output=True,
-            check=False,
-        )
-        result = CommandResult(
-            command=command,
-            returncode=completed.returncode,
-            stdout=completed.stdout,
-            stderr=completed.stderr,
+        """Run ``command`` and stream its output line by line.
+
+        Every line is forwarded to ``on_output`` as soon as it arrives, while
+        the returned result only keeps a bounded head and tail of each stream.
+        ``resource`` names the concurrency class when the executable does not,
+        such as composer started through a versioned PHP binary.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self.engine.run(command, cwd, False, on_output, timeout, resource), self._event_loop()
         )
-        if check and completed.returncode != 0:
+        self._pending.add(future)
+        try:
+            result = future.result()
+        except concurrent.futures.CancelledError:
+            raise RuntimeError(f"Command cancelled: {' '.join(command)}") from None
+        finally:
+            self._pending.discard(future)
+        if check:
+            self.check_result(result)
+        return result
+
+    def cancel(self) -> None:
+        """Terminate every command still running; their callers get a RuntimeError."""
+        for future in list(self._pending):
+            future.cancel()
+
+    @staticmethod
+    def check_result(result: CommandResult) -> None:
+        if result.returncode != 0:
             raise RuntimeError(
-                f"Command failed ({completed.returncode}): {' '.join(command)}\n{summarize_output(completed.stderr or completed.stdout)}"
+                f"Command failed ({result.returncode}): {' '.join(result.command)}\n"
+                f"{summarize_output(result.stderr or result.stdout)}"
             )
-        return result
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="commands", daemon=True).start()
+                self._loop = loop
+            return self._loop
 
 
 class EnvironmentInspector:
-    def __init__(self, runner: CommandRunner | None = None) -> None:
+    def __init__(
+        self,
+        runner: CommandRunner | None = None,
+        dpkg_status_path: Path = DPKG_STATUS_PATH,
+        apache_dir: Path = APACHE_DIR,
+        hosts_path: Path = HOSTS_PATH,
+        bin_dir: Path = BIN_DIR,
+        os_release_path: Path = OS_RELEASE_PATH,
+    ) -> None:
         self.runner = runner or CommandRunner()
+        self.dpkg_status_path = dpkg_status_path
+        self.apache_dir = apache_dir
+        self.hosts_path = hosts_path
+        self.bin_dir = bin_dir
+        self.os_release_path = os_release_path
+        self._dpkg_lock = threading.Lock()
+        self._dpkg_mtime: int | None = None
+        self._dpkg_installed: frozenset[str] = frozenset()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_key: tuple[int | None, ...] | None = None
+        self._snapshot: dict[str, object] = {}
+        self.snapshot_hits = 0
+        self.snapshot_misses = 0
+
+    def installed_packages(self) -> frozenset[str]:
+        """Names of installed packages, parsed once per change of the dpkg status file."""
+        try:
+            mtime = self.dpkg_status_path.stat().st_mtime_ns
+        except OSError:
+            return frozenset()
+        with self._dpkg_lock:
+            if mtime != self._dpkg_mtime:
+                self._dpkg_installed = self._parse_dpkg_status()
+                self._dpkg_mtime = mtime
+            return self._dpkg_installed
+
+    def is_package_installed(self, package_name: str) -> bool:
+        return package_name in self.installed_packages()
+
+    def _parse_dpkg_status(self) -> frozenset[str]:
+        installed: set[str] = set()
+        package = architecture = status = ""
+        with self.dpkg_status_path.open("r", encoding="utf-8", errors="replace") as handle:
+            for line in [*handle, "\n"]:
+                if not line.strip():
+                    if package and status == "install ok installed":
+                        installed.add(package)
+                        if architecture:
+                            installed.add(f"{package}:{architecture}")
+                    package = architecture = status = ""
+                elif line.startswith("Package:"):
+                    package = line[8:].strip()
+                elif line.startswith("Architecture:"):
+                    architecture = line[13:].strip()
+                elif line.startswith("Status:"):
+                    status = line[7:].strip()
+        return frozenset(installed)
 
     def command_exists(self, command: str) -> bool:
         return shutil.which(command) is not None
 
     def installed_php_versions(self) -> list[str]:
+        return list(self.preflight_snapshot()["php_versions"])
+
+    def _scan_php_versions(self) -> list[str]:
         versions: list[str] = []
-        php_dir = Path("/usr/bin")
-        if not php_dir.exists():
+        if not self.bin_dir.exists():
             return versions
-        for path in php_dir.glob("php[0-9].[0-9]"):
+        for path in self.bin_dir.glob("php[0-9].[0-9]"):
             versions.append(path.name.replace("php", ""))
         return sorted(set(versions), key=Version)
 
     def ubuntu_version(self) -> str:
-        os_release = Path("/etc/os-release")
-        if not os_release.exists():
+        if not self.os_release_path.exists():
             return ""
         data = {}
-        for line in os_release.read_text(encoding="utf-8").splitlines():
+        for line in self.os_release_path.read_text(encoding="utf-8").splitlines():
             if "=" not in line:
                 continue
             key, value = line.split("=", 1)
             data[key] = value.strip().strip('"')
         return data.get("VERSION_ID", "")
 
+    def hosts_entries(self) -> set[str]:
+        """Hostnames mapped in the hosts file, compared as whole tokens."""
+        try:
+            content = self.hosts_path.read_text(encoding="utf-8")
+        except OSError:
+            return set()
+        hostnames: set[str] = set()
+        for line in content.splitlines():
+            fields = line.split("#", 1)[0].split()
+            hostnames.update(field.lower() for field in fields[1:])
+        return hostnames
+
+    def site_config(self, site_name: str) -> str:
+        try:
+            return (self.apache_dir / "sites-available" / f"{site_name}.conf").read_text(encoding="utf-8")
+        except OSError:
+            return ""
+
+    def site_enabled(self, site_name: str) -> bool:
+        return (self.apache_dir / "sites-enabled" / f"{site_name}.conf").exists()
+
+    def apache_php_configured(self, php_version: str) -> bool:
+        """True when the modules and FPM conf that configure_apache_php enables are still enabled."""
+        enabled = self.apache_dir / "mods-enabled"
+        if not all((enabled / f"{module}.load").exists() for module in APACHE_PHP_MODULES):
+            return False
+        conf = f"php{php_version}-fpm.conf"
+        if (self.apache_dir / "conf-available" / conf).exists():
+            return (self.apache_dir / "conf-enabled" / conf).exists()
+        return True
+
+    def symlink_target(self, path: Path) -> str:
+        try:
+            return os.readlink(path)
+        except OSError:
+            return ""
+
+    def path_owner(self, path: Path) -> str:
+        try:
+            return pwd.getpwuid(path.stat().st_uid).pw_name
+        except (OSError, KeyError):
+            return ""
+
     def preflight_snapshot(self) -> dict[str, object]:
-        return {
-            "git": self.command_exists("git"),
-            "composer": self.command_exists("composer"),
-            "apache2": self.command_exists("apache2"),
-            "pkexec": self.command_exists("pkexec"),
-            "php_versions": self.installed_php_versions(),
-            "ubuntu_version": self.ubuntu_version(),
-        }
+        """Tool, PHP and OS facts, recomputed only when a watched path changes or after invalidate()."""
+        key = self._watched_mtimes()
+        with self._snapshot_lock:
+            if key == self._snapshot_key:
+                self.snapshot_hits += 1
+            else:
+                self.snapshot_misses += 1
+                self._snapshot = {
+                    "git": self.command_exists("git"),
+                    "composer": self.command_exists("composer"),
+                    "apache2": self.command_exists("apache2"),
+                    "pkexec": self.command_exists("pkexec"),
+                    "php_versions": self._scan_php_versions(),
+                    "ubuntu_version": self.ubuntu_version(),
+                }
+                self._snapshot_key = key
+            return {**self._snapshot, "php_versions": list(self._snapshot["php_versions"])}
+
+    def invalidate(self) -> None:
+        """Forget cached facts; called after privileged operations that install software."""
+        with self._snapshot_lock:
+            self._snapshot_key = None
+        with self._dpkg_lock:
+            self._dpkg_mtime = None
+
+    def cache_stats(self) -> dict[str, int]:
+        return {"hits": self.snapshot_hits, "misses": self.snapshot_misses}
+
+    def _watched_mtimes(self) -> tuple[int | None, ...]:
+        search_path = os.environ.get("PATH", os.defpath).split(os.pathsep)
+        paths = [self.bin_dir, self.dpkg_status_path, self.os_release_path, *map(Path, search_path)]
+        mtimes: list[int | None] = []
+        for path in dict.fromkeys(paths):
+            try:
+                mtimes.append(path.stat().st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+
+class PrivilegedSession:
+    """Long-lived ``privileged_helper serve`` process shared by a whole batch.
+
+    pkexec authenticates once when the session starts; afterwards every
+    operation is a single JSON line written to the helper's stdin and answered
+    on its stdout. Closing stdin makes the helper exit.
+    """
+
+    def __init__(self, helper_command: list[str]) -> None:
+        self.command = [*helper_command, "serve"]
+        self._process: subprocess.Popen[str] | None = None
+        self._stderr_tail: deque[str] = deque(maxlen=40)
+        self._ids = itertools.count(1)
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def request(self, operation: str, payload: dict[str, object]) -> dict[str, object]:
+        process = self._ensure_started()
+        request_id = next(self._ids)
+        message = json.dumps({"id": request_id, "operation": operation, "payload": payload})
+        try:
+            process.stdin.write(message + "\n")
+            process.stdin.flush()
+            line = process.stdout.readline()
+        except (BrokenPipeError, OSError):
+            line = ""
+        if not line:
+            self.close()
+            detail = summarize_output(" ".join(self._stderr_tail))
+            raise RuntimeError(detail or "Privileged helper session ended unexpectedly.")
+        response = json.loads(line)
+        if response.get("id") != request_id:
+            self.close()
+            raise RuntimeError("Privileged helper session is out of sync.")
+        return response
+
+    def close(self) -> None:
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def _ensure_started(self) -> subprocess.Popen[str]:
+        if self.alive:
+            return self._process
+        self._stderr_tail.clear()
+        process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        threading.Thread(target=self._drain_stderr, args=(process,), daemon=True).start()
+        self._process = process
+        return process
+
+    def _drain_stderr(self, process: subprocess.Popen[str]) -> None:
+        for line in process.stderr:
+            self._stderr_tail.append(line.rstrip())
 
 
 class PrivilegedOperations:
-    def __init__(self, helper_command: list[str] | None = None) -> None:
+    def __init__(self, helper_command: list[str] | None = None, persistent: bool = True) -> None:
         self.helper_command = helper_command or self._default_helper_command()
+        # apt, Apache and /etc/hosts must never be modified concurrently, so every
+        # helper invocation is serialized even when projects run in parallel.
+        self._lock = threading.Lock()
+        self._session = PrivilegedSession(self.helper_command) if persistent else None
+        if self._session is not None:
+            atexit.register(self._session.close)
 
     def _default_helper_command(self) -> list[str]:
         packaged_helper = Path("/usr/lib/laravel-installer/laravel-installer-helper")
@@ -90,29 +515,65 @@ class PrivilegedOperations:
         return ["pkexec", os.environ.get("PYTHON", shutil.which("python3") or "python3"), "-m", "laravel_installer.privileged_helper"]
 
     def run_operation(self, operation: str, payload: dict[str, object]) -> CommandResult:
-        command = [*self.helper_command, operation]
-        completed = subprocess.run(
-            command,
-            input=json.dumps(payload),
-            text=True,
-            capture_output=True,
-            check=False,
-        )
+        with self._lock:
+            started_at = time.time()
+            if self._session is not None:
+                result = self._run_in_session(operation, payload)
+                result.started_at, result.finished_at = started_at, time.time()
+                return result
+            command = [*self.helper_command, operation]
+            completed = subprocess.run(
+                command,
+                input=json.dumps(payload),
+                text=True,
+                capture_output=True,
+                check=False,
+            )
         result = CommandResult(
             command=command,
             returncode=completed.returncode,
             stdout=completed.stdout,
             stderr=completed.stderr,
+            started_at=started_at,
+            finished_at=time.time(),
         )
         if completed.returncode != 0:
             raise RuntimeError(summarize_output(completed.stderr or completed.stdout or "Privileged operation failed."))
         return result
 
+    def _run_in_session(self, operation: str, payload: dict[str, object]) -> CommandResult:
+        response = self._session.request(operation, payload)
+        error = str(response.get("error", ""))
+        if not response.get("ok"):
+            raise RuntimeError(summarize_output(error or "Privileged operation failed."))
+        return CommandResult(
+            command=[*self._session.command, operation],
+            returncode=0,
+            stdout=json.dumps(response.get("result")),
+            stderr=error,
+        )
+
+    @staticmethod
+    def operation_result(result: CommandResult) -> object:
+        """Decode the JSON value an operation reported on the helper's stdout."""
+        try:
+            return json.loads(result.stdout) if result.stdout.strip() else None
+        except json.JSONDecodeError:
+            return None
+
+    def close(self) -> None:
+        if self._session is not None:
+            with self._lock:
+                self._session.close()
+
     def run_operations(self, operations: list[dict[str, object]]) -> CommandResult:
         return self.run_operation("run_operations", {"operations": operations})
 
-    def install_packages(self, packages: Iterable[str]) -> CommandResult:
-        return self.run_operation("install_packages", {"packages": list(packages)})
+    def install_packages(self, packages: Iterable[str], lists_max_age: int | None = None) -> CommandResult:
+        payload: dict[str, object] = {"packages": list(packages)}
+        if lists_max_age is not None:
+            payload["lists_max_age"] = lists_max_age
+        return self.run_operation("install_packages", payload)
 
     def write_vhost(self, site_name: str, content: str) -> CommandResult:
         return self.run_operation("write_vhost", {"site_name": site_name, "content": content})
@@ -126,6 +587,9 @@ class PrivilegedOperations:
     def ensure_hosts_entry(self, hostname: str) -> CommandResult:
         return self.run_operation("ensure_hosts_entry", {"hostname": hostname})
 
+    def sync_hosts_entries(self, hostnames: Iterable[str], prune: bool = False) -> CommandResult:
+        return self.run_operation("sync_hosts_entries", {"hostnames": list(hostnames), "prune": prune})
+
     def link_public_dir(self, source: str, destination: str) -> CommandResult:
         return self.run_operation("link_public_dir", {"source": source, "destination": destination})
 
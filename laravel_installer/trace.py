@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import json
+import re
+from pathlib import Path
+from typing import Any, Iterable
+
+_VERB = re.compile(r"^[a-z][a-z-]*$")
+
+
+def chrome_trace(events: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """Convert run log events to the Chrome trace format (chrome://tracing, Perfetto).
+
+    Every project gets its own track; each step is a span on it, with the
+    subprocesses that ran during the step nested underneath.
+    """
+    events = [event for event in events if event.get("started_at") or event.get("event") in ("run_start", "run_end")]
+    if not events:
+        return {"traceEvents": [], "displayTimeUnit": "ms"}
+    origin = min(float(event.get("started_at") or event["ts"]) for event in events)
+    trace_events: list[dict[str, Any]] = []
+    tracks: dict[str, int] = {}
+
+    def track(project: str) -> int:
+        if project not in tracks:
+            tracks[project] = len(tracks) + 1
+            trace_events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tracks[project], "args": {"name": project}})
+        return tracks[project]
+
+    def span(name: str, category: str, project: str, event: dict[str, Any], args: dict[str, Any]) -> dict[str, Any]:
+        started, finished = float(event["started_at"]), float(event.get("finished_at") or event["started_at"])
+        return {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "pid": 1,
+            "tid": track(project),
+            "ts": round((started - origin) * 1_000_000),
+            "dur": round(max(0.0, finished - started) * 1_000_000),
+            "args": args,
+        }
+
+    for event in events:
+        kind = event.get("event")
+        if kind == "step":
+            args = {key: event.get(key) for key in ("status", "summary", "cpu_seconds", "max_rss_kb")}
+            trace_events.append(span(str(event.get("step", "")), "step", str(event.get("project_name", "")), event, args))
+        elif kind == "command_end":
+            command = [str(part) for part in event.get("command", [])]
+            args = {
+                "command": " ".join(command),
+                "returncode": event.get("returncode"),
+                "cpu_seconds": event.get("cpu_seconds"),
+                "max_rss_kb": event.get("max_rss_kb"),
+            }
+            trace_events.append(span(command_name(command), "command", str(event.get("project", "")), event, args))
+        elif kind in ("run_start", "run_end"):
+            trace_events.append(
+                {"name": kind, "ph": "i", "s": "g", "pid": 1, "tid": 0, "ts": round((float(event["ts"]) - origin) * 1_000_000)}
+            )
+    return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+
+def command_name(command: list[str]) -> str:
+    """Short label such as ``git clone`` or ``composer install``."""
+    if not command:
+        return "command"
+    parts = command[1:] if Path(command[0]).name.startswith("php") and len(command) > 1 else command
+    verb = next((part for part in parts[1:] if _VERB.match(part)), "")
+    return f"{Path(parts[0]).name} {verb}".strip()
+
+
+def write_chrome_trace(events: Iterable[dict[str, Any]], path: Path) -> int:
+    """Write the trace to ``path`` and return the number of trace events."""
+    trace = chrome_trace(events)
+    path.write_text(json.dumps(trace), encoding="utf-8")
+    return len(trace["traceEvents"])
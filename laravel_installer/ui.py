@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import os
 import queue
 import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from tkinter import messagebox
 
 import customtkinter as ctk
@@ -18,13 +20,17 @@ from .constants import (
     COLOR_SUCCESS,
     COLOR_TEXT_DIM,
     COLOR_WARNING,
+    DEFAULT_LOG_MAX_LINES,
+    LOG_BATCH_LIMIT,
+    LOG_POLL_ACTIVE_MS,
+    LOG_POLL_IDLE_MS,
+    QUEUE_VISIBLE_ROWS,
+    STARTUP_PROBE_ENV,
+    SUMMARY_DEBOUNCE_MS,
 )
 from .installer import InstallerService
 from .models import AppConfig, ProjectConfig, ProjectExecution
 
-ctk.set_appearance_mode("Dark")
-ctk.set_default_color_theme("blue")
-
 
 class SidebarButton(ctk.CTkButton):
     def __init__(self, master, text, command, **kwargs):
@@ -41,6 +47,89 @@ class SidebarButton(ctk.CTkButton):
         )
 
 
+class ProjectQueueView(ctk.CTkFrame):
+    """Scrolling window over the project queue backed by a fixed pool of rows.
+
+    Rows are recycled instead of rebuilt: set_projects() and scrolling only
+    reconfigure the slots whose text changed, so the cost of a redraw does not
+    grow with the length of the queue.
+    """
+
+    def __init__(self, master, on_remove, visible_rows: int = QUEUE_VISIBLE_ROWS, **kwargs):
+        super().__init__(master, fg_color="transparent", **kwargs)
+        self.on_remove = on_remove
+        self.projects: list[ProjectConfig] = []
+        self.offset = 0
+        self.grid_columnconfigure(0, weight=1)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, rowspan=visible_rows, sticky="ns", padx=(5, 0))
+        self.rows: list[tuple[ctk.CTkFrame, ctk.CTkLabel]] = []
+        self._rendered: list[str | None] = [None] * visible_rows
+        for slot in range(visible_rows):
+            row = ctk.CTkFrame(self, fg_color="#333333", height=56)
+            label = ctk.CTkLabel(row, text="", font=("Segoe UI", 13, "bold"))
+            label.pack(side="left", padx=15)
+            ctk.CTkButton(
+                row,
+                text="Remove",
+                width=80,
+                height=28,
+                fg_color=COLOR_DANGER,
+                command=lambda s=slot: self._remove_slot(s),
+            ).pack(side="right", padx=10, pady=12)
+            for widget in (row, label):
+                widget.bind("<MouseWheel>", self._on_mousewheel)
+                widget.bind("<Button-4>", lambda _event: self.scroll_by(-1))
+                widget.bind("<Button-5>", lambda _event: self.scroll_by(1))
+            self.rows.append((row, label))
+        self._render()
+
+    def set_projects(self, projects: list[ProjectConfig]) -> None:
+        self.projects = list(projects)
+        self._render()
+
+    def scroll_by(self, rows: int) -> None:
+        self.offset += rows
+        self._render()
+
+    def _on_mousewheel(self, event) -> None:
+        self.scroll_by(-1 if event.delta > 0 else 1)
+
+    def _on_scrollbar(self, action: str, value: str, unit: str = "units") -> None:
+        if action == "moveto":
+            self.offset = round(float(value) * len(self.projects))
+            self._render()
+        else:
+            self.scroll_by(int(value) * (len(self.rows) if unit == "pages" else 1))
+
+    def _remove_slot(self, slot: int) -> None:
+        index = self.offset + slot
+        if index < len(self.projects):
+            self.on_remove(index)
+
+    def _render(self) -> None:
+        total = len(self.projects)
+        self.offset = min(max(self.offset, 0), max(0, total - len(self.rows)))
+        for slot, (row, label) in enumerate(self.rows):
+            index = self.offset + slot
+            text = None
+            if index < total:
+                project = self.projects[index]
+                text = f"{project.name}  |  {project.hostname}  |  {project.target_dir}"
+            if text == self._rendered[slot]:
+                continue
+            self._rendered[slot] = text
+            if text is None:
+                row.grid_remove()
+            else:
+                label.configure(text=text)
+                row.grid(row=slot, column=0, sticky="ew", pady=2)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + len(self.rows)) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+
 class LaravelInstallerApp(ctk.CTk):
     def __init__(self, store: ConfigStore | None = None, installer: InstallerService | None = None):
         super().__init__()
@@ -57,6 +146,9 @@ class LaravelInstallerApp(ctk.CTk):
         self.log_queue: queue.Queue[tuple[str, str]] = queue.Queue()
         self.project_runs: list[ProjectExecution] = []
         self.is_running = False
+        self._summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preflight")
+        self._summary_after_id: str | None = None
+        self._summary_generation = 0
 
         self.sidebar = ctk.CTkFrame(self, width=220, corner_radius=0, fg_color=COLOR_SIDEBAR)
         self.sidebar.grid(row=0, column=0, sticky="nsew")
@@ -66,15 +158,17 @@ class LaravelInstallerApp(ctk.CTk):
         self.content_area.grid(row=0, column=1, sticky="nsew", padx=20, pady=20)
 
         self.frame_dashboard = ctk.CTkScrollableFrame(self.content_area, fg_color="transparent")
-        self.frame_logs = ctk.CTkFrame(self.content_area, fg_color="transparent")
+        self.frame_logs: ctk.CTkFrame | None = None
+        self.log_textbox: ctk.CTkTextbox | None = None
 
         self._build_sidebar()
         self._build_dashboard()
-        self._build_logs()
-        self._load_projects()
+        self.refresh_queue_ui()
         self.show_dashboard()
+        # The preflight summary and the Logs view are built only after the first paint.
+        self._first_map_id: str | None = self.bind("<Map>", self._on_first_map, add="+")
 
-        self.after(100, self._process_log_queue)
+        self.after(LOG_POLL_IDLE_MS, self._process_log_queue)
         self.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def _build_sidebar(self) -> None:
@@ -161,6 +255,14 @@ class LaravelInstallerApp(ctk.CTk):
         self.btn_retry.pack(fill="x", pady=(12, 0))
         self.btn_retry.configure(state="disabled")
 
+        self.var_force = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(
+            action_bar,
+            text="Redo every step even when inputs are unchanged",
+            variable=self.var_force,
+            font=("Segoe UI", 12),
+        ).pack(anchor="w", pady=(12, 0))
+
         queue_card = ctk.CTkFrame(self.frame_dashboard, fg_color=COLOR_CARD, corner_radius=15)
         queue_card.pack(fill="both", expand=True)
         queue_header = ctk.CTkFrame(queue_card, fg_color="transparent")
@@ -178,10 +280,14 @@ class LaravelInstallerApp(ctk.CTk):
             command=self.clear_queue,
         )
         self.btn_clear_queue.pack(side="right")
-        self.queue_container = ctk.CTkScrollableFrame(queue_card, fg_color="transparent", height=300)
-        self.queue_container.pack(fill="both", expand=True, padx=10, pady=(0, 20))
+        self.queue_view = ProjectQueueView(queue_card, on_remove=self.remove_project)
+        self.queue_view.pack(fill="both", expand=True, padx=10, pady=(0, 20))
 
     def _build_logs(self) -> None:
+        self.frame_logs = ctk.CTkFrame(self.content_area, fg_color="transparent")
+        logs_header = ctk.CTkFrame(self.frame_logs, fg_color="transparent")
+        logs_header.pack(fill="x", pady=(0, 10))
+        ctk.CTkButton(logs_header, text="Load Previous Run", width=150, command=self.load_previous_run).pack(side="right")
         self.log_textbox = ctk.CTkTextbox(self.frame_logs, font=("Consolas", 12), fg_color="#111111", text_color="#eeeeee", corner_radius=10)
         self.log_textbox.pack(fill="both", expand=True)
         self.log_textbox.tag_config("error", foreground="#ef4444")
@@ -195,18 +301,32 @@ class LaravelInstallerApp(ctk.CTk):
         entry.grid(row=row + 1, column=column, padx=5 if column == 0 else 15, pady=(5, 0), sticky="w")
         return entry
 
-    def _load_projects(self) -> None:
-        self.refresh_queue_ui()
+    def _on_first_map(self, _event=None) -> None:
+        if self._first_map_id is None:
+            return
+        self.unbind("<Map>", self._first_map_id)
+        self._first_map_id = None
+        self.after_idle(self._after_first_paint)
+
+    def _after_first_paint(self) -> None:
+        if os.environ.get(STARTUP_PROBE_ENV):
+            # Measured by laravel_installer.startup: report the first paint and quit.
+            print("first-paint", flush=True)
+            self.destroy()
+            return
         self.refresh_summary()
 
     def _current_projects(self) -> list[ProjectConfig]:
         return self.config_state.projects
 
     def show_dashboard(self) -> None:
-        self.frame_logs.pack_forget()
+        if self.frame_logs is not None:
+            self.frame_logs.pack_forget()
         self.frame_dashboard.pack(fill="both", expand=True)
 
     def show_logs(self) -> None:
+        if self.frame_logs is None:
+            self._build_logs()
         self.frame_dashboard.pack_forget()
         self.frame_logs.pack(fill="both", expand=True)
 
@@ -214,16 +334,45 @@ class LaravelInstallerApp(ctk.CTk):
         self.log_queue.put((message, level))
 
     def _process_log_queue(self) -> None:
+        """Drain queued messages in one pass: one insert per run of same-tag lines, then trim."""
+        runs: list[tuple[str, list[str]]] = []
+        if self.log_textbox is None:
+            # Messages wait in the queue until the Logs view is first opened.
+            self.after(LOG_POLL_IDLE_MS, self._process_log_queue)
+            return
         try:
-            while True:
+            for _ in range(LOG_BATCH_LIMIT):
                 message, level = self.log_queue.get_nowait()
-                self.log_textbox.configure(state="normal")
-                self.log_textbox.insert("end", f"{message}\n", level)
-                self.log_textbox.see("end")
-                self.log_textbox.configure(state="disabled")
+                if runs and runs[-1][0] == level:
+                    runs[-1][1].append(message)
+                else:
+                    runs.append((level, [message]))
         except queue.Empty:
             pass
-        self.after(100, self._process_log_queue)
+        if runs:
+            self.log_textbox.configure(state="normal")
+            for level, messages in runs:
+                self.log_textbox.insert("end", "".join(f"{message}\n" for message in messages), level)
+            self._trim_log()
+            self.log_textbox.see("end")
+            self.log_textbox.configure(state="disabled")
+        self.after(LOG_POLL_ACTIVE_MS if runs else LOG_POLL_IDLE_MS, self._process_log_queue)
+
+    def _trim_log(self) -> None:
+        max_lines = max(1, int(self.config_state.ui_preferences.get("log_max_lines", DEFAULT_LOG_MAX_LINES)))
+        excess = int(self.log_textbox.index("end-1c").split(".")[0]) - 1 - max_lines
+        if excess > 0:
+            self.log_textbox.delete("1.0", f"{excess + 1}.0")
+
+    def load_previous_run(self) -> None:
+        if self.is_running:
+            return
+        runs = self.installer.run_logs.runs()
+        if not runs:
+            messagebox.showinfo("No previous runs", "No run logs have been recorded yet.")
+            return
+        self.log(f"--- Replaying {runs[0].name} ---", "info")
+        threading.Thread(target=self.installer.run_logs.replay, args=(runs[0], self.log), daemon=True).start()
 
     def add_project(self) -> None:
         project = ProjectConfig(
@@ -261,31 +410,44 @@ class LaravelInstallerApp(ctk.CTk):
         self.refresh_summary()
 
     def refresh_queue_ui(self) -> None:
-        for widget in self.queue_container.winfo_children():
-            widget.destroy()
         project_count = len(self._current_projects())
         self.lbl_count.configure(text=f"{project_count} Projects")
         self.btn_clear_queue.configure(state="normal" if project_count else "disabled")
-        for idx, project in enumerate(self._current_projects()):
-            row = ctk.CTkFrame(self.queue_container, fg_color="#333333", height=56)
-            row.pack(fill="x", pady=2)
-            text = f"{project.name}  |  {project.hostname}  |  {project.target_dir}"
-            ctk.CTkLabel(row, text=text, font=("Segoe UI", 13, "bold")).pack(side="left", padx=15)
-            ctk.CTkButton(
-                row,
-                text="Remove",
-                width=80,
-                height=28,
-                fg_color=COLOR_DANGER,
-                command=lambda i=idx: self.remove_project(i),
-            ).pack(side="right", padx=10, pady=12)
+        self.queue_view.set_projects(self._current_projects())
 
     def refresh_summary(self) -> None:
+        """Schedule a summary rebuild; a burst of calls inside the debounce window builds it once."""
+        self._summary_generation += 1
+        if self._summary_after_id is not None:
+            self.after_cancel(self._summary_after_id)
+        self._summary_after_id = self.after(SUMMARY_DEBOUNCE_MS, self._submit_summary)
+
+    def _submit_summary(self) -> None:
+        self._summary_after_id = None
         self.config_state.default_base_dir = self.entry_base_dir.get().strip() or self.config_state.default_base_dir
+        generation = self._summary_generation
+        future = self._summary_executor.submit(
+            self._build_summary, generation, list(self._current_projects()), self.config_state.default_base_dir
+        )
+        future.add_done_callback(lambda done: self._deliver_summary(generation, done))
+
+    def _build_summary(self, generation: int, projects: list[ProjectConfig], default_base_dir: str) -> str | None:
+        if generation != self._summary_generation:
+            return None
         try:
-            summary = self.installer.build_preflight_summary(self._current_projects(), self.config_state.default_base_dir)
+            return self.installer.build_preflight_summary(projects, default_base_dir)
         except Exception as exc:
-            summary = f"Could not build summary: {exc}"
+            return f"Could not build summary: {exc}"
+
+    def _deliver_summary(self, generation: int, future: Future) -> None:
+        # Runs on the executor thread; hand the text back to the Tk loop unless a newer request superseded it.
+        if future.cancelled() or generation != self._summary_generation:
+            return
+        self.after(0, lambda: self._show_summary(generation, future.result()))
+
+    def _show_summary(self, generation: int, summary: str | None) -> None:
+        if summary is None or generation != self._summary_generation:
+            return
         self.summary_textbox.configure(state="normal")
         self.summary_textbox.delete("1.0", "end")
         self.summary_textbox.insert("1.0", summary)
@@ -299,14 +461,17 @@ class LaravelInstallerApp(ctk.CTk):
         self.btn_run.configure(state="disabled", text="RUNNING...")
         self.btn_retry.configure(state="disabled")
         self.persist_config()
-        threading.Thread(target=self._run_installation, daemon=True).start()
+        threading.Thread(target=self._run_installation, args=(self.var_force.get(),), daemon=True).start()
 
-    def _run_installation(self) -> None:
+    def _run_installation(self, force: bool) -> None:
         try:
             self.project_runs = self.installer.execute_projects(
                 self._current_projects(),
                 self.config_state.default_base_dir,
                 self.log,
+                max_workers=self.config_state.max_parallel_projects,
+                force=force,
+                apt_lists_max_age=self.config_state.apt_lists_max_age,
             )
             failed = [run.project.name for run in self.project_runs if run.failed]
             self.after(0, lambda: self._finish_installation(failed))
@@ -333,10 +498,19 @@ class LaravelInstallerApp(ctk.CTk):
         self.is_running = True
         self.btn_run.configure(state="disabled", text="RUNNING...")
         self.btn_retry.configure(state="disabled")
+        force = self.var_force.get()
 
         def worker() -> None:
             try:
-                reruns = self.installer.execute_projects(failed, self.config_state.default_base_dir, self.log)
+                reruns = self.installer.execute_projects(
+                    failed,
+                    self.config_state.default_base_dir,
+                    self.log,
+                    max_workers=self.config_state.max_parallel_projects,
+                    force=force,
+                    apt_lists_max_age=self.config_state.apt_lists_max_age,
+                    resume=True,
+                )
                 self.project_runs = reruns
                 failed_names = [run.project.name for run in reruns if run.failed]
                 self.after(0, lambda: self._finish_installation(failed_names))
@@ -354,10 +528,18 @@ class LaravelInstallerApp(ctk.CTk):
             entry.delete(0, "end")
 
     def on_close(self) -> None:
+        self._summary_generation += 1
+        if self._summary_after_id is not None:
+            self.after_cancel(self._summary_after_id)
+        self._summary_executor.shutdown(wait=False, cancel_futures=True)
         self.persist_config()
+        self.installer.runner.cancel()
+        self.installer.privileged.close()
         self.destroy()
 
 
 def run_app() -> None:
+    ctk.set_appearance_mode("Dark")
+    ctk.set_default_color_theme("blue")
     app = LaravelInstallerApp()
     app.mainloop()
@@ -24,6 +24,13 @@ def normalize_target_dir(value: str, project_name: str, default_base: str) -> Pa
     return target
 
 
+def normalize_clone_filter(value: str) -> str:
+    raw = value.strip()
+    if raw and not re.fullmatch(r"(blob:none|blob:limit=\d+[kmg]?|tree:\d+)", raw):
+        raise ValueError("Clone filter must be blob:none, blob:limit=<size> or tree:<depth>.")
+    return raw
+
+
 def summarize_output(output: str, limit: int = 400) -> str:
     cleaned = " ".join(output.split())
     if len(cleaned) <= limit:
@@ -0,0 +1,41 @@
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmarks.execute_projects import BASELINE_PATH, compare, run_benchmark
+
+SLOW_TESTS_ENV = "LARAVEL_INSTALLER_SLOW_TESTS"
+
+
+class ExecuteProjectsBenchmarkTests(unittest.TestCase):
+    def test_small_queues_do_not_exceed_baseline_counters(self):
+        baseline = json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+        results = {}
+        for size in (1, 10):
+            with tempfile.TemporaryDirectory() as tmp:
+                results[str(size)] = run_benchmark(size, Path(tmp), scale=0)
+        self.assertEqual(compare(results, baseline, tolerance=-1), [])
+        self.assertEqual(results["10"]["warm"]["privileged_round_trips"], 0)
+
+    @unittest.skipUnless(os.environ.get(SLOW_TESTS_ENV), f"set {SLOW_TESTS_ENV}=1 to run the 100 and 1000 project benchmarks")
+    def test_large_queues_stay_within_baseline(self):
+        baseline = json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+        results = {}
+        for size in (100, 1000):
+            with tempfile.TemporaryDirectory() as tmp:
+                results[str(size)] = run_benchmark(size, Path(tmp))
+        # Generous wall-time slack: this guards against superlinear bookkeeping, not machine noise.
+        self.assertEqual(compare(results, baseline, tolerance=1.0), [])
+
+    def test_compare_flags_counter_and_wall_time_regressions(self):
+        baseline = {"10": {"cold": {"wall_seconds": 1.0, "subprocesses": 41, "privileged_round_trips": 12, "reloads": 1}}}
+        results = {"10": {"cold": {"wall_seconds": 2.0, "subprocesses": 41, "privileged_round_trips": 21, "reloads": 1}}}
+        regressions = compare(results, baseline, tolerance=0.5)
+        self.assertEqual(len(regressions), 2)
+        self.assertIn("privileged_round_trips 21 > baseline 12", regressions[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import contextlib
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from laravel_installer import cli, startup
+from laravel_installer.config import StateStore
+from laravel_installer.constants import CLI_IMPORT_BUDGET_MS
+from laravel_installer.installer import InstallerService
+from laravel_installer.models import ProjectExecution, StepResult
+from laravel_installer.startup import import_times
+
+
+class CliTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        root = Path(self.tmp.name)
+        self.manifest = root / "manifest.json"
+        self.manifest.write_text(
+            json.dumps(
+                {
+                    "default_base_dir": "/srv/www",
+                    "projects": [
+                        {"name": "shop", "repo_url": "git@example.com:shop.git"},
+                        {"name": "blog", "repo_url": "git@example.com:blog.git"},
+                    ],
+                }
+            ),
+            encoding="utf-8",
+        )
+        self.service = InstallerService(
+            runner=mock.Mock(),
+            inspector=mock.Mock(),
+            privileged=mock.Mock(),
+            state=StateStore(root / "state.json"),
+            run_logs=mock.Mock(),
+        )
+
+    def _main(self, *argv):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()):
+            code = cli.main(["--manifest", str(self.manifest), *argv], installer=self.service)
+        return code, stdout.getvalue()
+
+    def test_retry_resumes_only_failed_projects(self):
+        self.service.state.record_step(StepResult("shop", "composer", "failed", "Command failed (1)"))
+        self.service.state.record_step(StepResult("blog", "publish", "completed", "Published"))
+
+        def fake_execute(projects, base_dir, log_callback, **kwargs):
+            self.assertEqual([project.name for project in projects], ["shop"])
+            self.assertEqual(base_dir, "/srv/www")
+            self.assertTrue(kwargs["resume"])
+            return [ProjectExecution(project=project) for project in projects]
+
+        with mock.patch.object(self.service, "execute_projects", side_effect=fake_execute) as execute:
+            code, output = self._main("retry")
+        self.assertEqual(code, 0)
+        execute.assert_called_once()
+        self.assertIn("finished successfully", output)
+        self.service.privileged.close.assert_called_once()
+
+    def test_status_reports_last_outcome_per_project(self):
+        self.service.state.record_step(StepResult("shop", "composer", "failed", "Command failed (1): composer"))
+        code, output = self._main("status")
+        self.assertEqual(code, 0)
+        self.assertEqual(output.splitlines(), ["shop  failed: Command failed (1): composer", "blog  not run"])
+
+    def test_unknown_project_and_missing_manifest_are_usage_errors(self):
+        self.assertEqual(self._main("run", "nope")[0], 2)
+        self.manifest.unlink()
+        self.assertEqual(self._main("plan")[0], 2)
+
+    def test_malformed_manifest_is_a_usage_error(self):
+        self.manifest.write_text('{"projects": [', encoding="utf-8")
+        stderr = io.StringIO()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(stderr):
+            code = cli.main(["--manifest", str(self.manifest), "plan"], installer=self.service)
+        self.assertEqual(code, 2)
+        self.assertIn("Invalid manifest", stderr.getvalue())
+        self.service.privileged.close.assert_not_called()
+
+    def test_cold_import_stays_headless_and_within_budget(self):
+        times = import_times("laravel_installer.cli")
+        self.assertNotIn("tkinter", times)
+        self.assertNotIn("customtkinter", times)
+        self.assertLess(times["laravel_installer.cli"] / 1000, CLI_IMPORT_BUDGET_MS)
+
+    def test_startup_report_fails_when_budget_is_exceeded(self):
+        with contextlib.redirect_stdout(io.StringIO()) as stdout, contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(startup.main(["--module", "laravel_installer.cli", "--skip-paint", "--import-budget-ms", "0"]), 1)
+            self.assertEqual(
+                startup.main(["--module", "laravel_installer.cli", "--skip-paint", "--import-budget-ms", "60000"]), 0
+            )
+        self.assertIn("laravel_installer.cli", stdout.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
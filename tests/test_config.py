@@ -3,8 +3,9 @@ import tempfile
 import unittest
 from pathlib import Path
 
-from laravel_installer.config import ConfigStore
-from laravel_installer.models import AppConfig, ProjectConfig
+from laravel_installer.config import ConfigStore, StateStore
+from laravel_installer.constants import DEFAULT_MAX_PARALLEL_PROJECTS
+from laravel_installer.models import AppConfig, ProjectConfig, StepResult
 
 
 class ConfigStoreTests(unittest.TestCase):
@@ -30,6 +31,75 @@ class ConfigStoreTests(unittest.TestCase):
             loaded = store.load()
             self.assertEqual(loaded.to_dict(), AppConfig().to_dict())
 
+    def test_invalid_clone_depth_falls_back_to_full_clone(self):
+        for clone_depth in ("full", None, [1]):
+            project = ProjectConfig.from_dict({"name": "shop", "repo_url": "git@example.com:shop.git", "clone_depth": clone_depth})
+            self.assertEqual(project.clone_depth, 0)
+        self.assertEqual(ProjectConfig.from_dict({"name": "shop", "repo_url": "x", "clone_depth": "5"}).clone_depth, 5)
+
+    def test_invalid_max_parallel_projects_falls_back_to_default(self):
+        self.assertEqual(AppConfig.from_dict({"max_parallel_projects": "many"}).max_parallel_projects, DEFAULT_MAX_PARALLEL_PROJECTS)
+        self.assertEqual(AppConfig.from_dict({"max_parallel_projects": 0}).max_parallel_projects, 1)
+        self.assertEqual(AppConfig.from_dict({"max_parallel_projects": "3"}).max_parallel_projects, 3)
+
+
+class StateStoreTests(unittest.TestCase):
+    def test_record_and_forget_fingerprints_persist(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "state.json"
+            store = StateStore(path)
+            store.record("shop", "composer", "abc")
+            store.record("blog", "composer", "def")
+            self.assertEqual(StateStore(path).fingerprint("shop", "composer"), "abc")
+            store.forget("shop", "composer")
+            store.forget("blog")
+            reloaded = StateStore(path)
+            self.assertEqual(reloaded.fingerprint("shop", "composer"), "")
+            self.assertEqual(reloaded.fingerprint("blog", "composer"), "")
+            self.assertEqual(json.loads(path.read_text(encoding="utf-8")), {"projects": {"shop": {}}, "checkpoints": {}})
+
+    def test_checkpoints_keep_latest_result_per_step(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "state.json"
+            store = StateStore(path)
+            store.record_step(StepResult(project_name="shop", step="git_pull", status="completed", summary="ok"))
+            store.record_step(StepResult(project_name="shop", step="project", status="failed", summary="boom", retryable=True))
+            store.record_step(StepResult(project_name="blog", step="git_pull", status="completed", summary="ok"))
+            reloaded = StateStore(path)
+            self.assertEqual(reloaded.failed_projects(), ["shop"])
+            self.assertEqual(list(reloaded.checkpoint("shop")), ["git_pull", "project"])
+            self.assertTrue(reloaded.checkpoint("shop")["project"].retryable)
+            reloaded.clear_checkpoint("shop", "project")
+            self.assertEqual(StateStore(path).failed_projects(), [])
+
+    def test_changes_are_journaled_and_folded_into_the_state_file_on_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "state.json"
+            store = StateStore(path)
+            store.record("shop", "composer", "abc")
+            for index in range(50):
+                store.record_step(StepResult(project_name="shop", step=f"step{index}", status="completed", summary="ok"))
+            self.assertFalse(path.exists())
+            self.assertEqual(len(store.journal_path.read_text(encoding="utf-8").splitlines()), 51)
+
+            with store.journal_path.open("a", encoding="utf-8") as journal:
+                journal.write('{"op": "record", "project": "sh')
+            reloaded = StateStore(path)
+            self.assertEqual(reloaded.fingerprint("shop", "composer"), "abc")
+            self.assertEqual(len(reloaded.checkpoint("shop")), 50)
+            self.assertEqual(reloaded.journal_path.stat().st_size, 0)
+            self.assertEqual(json.loads(path.read_text(encoding="utf-8"))["projects"], {"shop": {"composer": "abc"}})
+
+            store.forget("shop")
+            store.compact()
+            self.assertEqual(StateStore(path).fingerprint("shop", "composer"), "")
+
+    def test_corrupt_state_file_starts_empty(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "state.json"
+            path.write_text("[1, 2", encoding="utf-8")
+            self.assertEqual(StateStore(path).fingerprint("shop", "composer"), "")
+
 
 if __name__ == "__main__":
     unittest.main()
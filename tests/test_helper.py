@@ -1,9 +1,16 @@
+import io
+import json
+import os
+import sys
 import tempfile
 import unittest
 from pathlib import Path
 from unittest import mock
 
 from laravel_installer import privileged_helper
+from laravel_installer.system import PrivilegedOperations
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
 
 
 class PrivilegedHelperTests(unittest.TestCase):
@@ -11,6 +18,73 @@ class PrivilegedHelperTests(unittest.TestCase):
         with self.assertRaises(ValueError):
             privileged_helper.install_packages({"packages": "git"})
 
+    @mock.patch("laravel_installer.privileged_helper.run_captured")
+    @mock.patch("laravel_installer.privileged_helper.run")
+    @mock.patch("laravel_installer.privileged_helper.packages_with_candidates", return_value={"php8.3", "php8.3-fpm"})
+    @mock.patch("laravel_installer.privileged_helper.apt_lists_age", return_value=60.0)
+    def test_install_packages_skips_update_when_lists_are_fresh(self, age_mock, candidates_mock, run_mock, captured_mock):
+        captured_mock.return_value = mock.Mock(returncode=0, stdout="", stderr="")
+        result = privileged_helper.install_packages({"packages": ["php8.3", "php8.3-fpm"], "lists_max_age": 300})
+        self.assertEqual(result, {"apt_update_skipped": True})
+        run_mock.assert_not_called()
+        captured_mock.assert_called_once_with(["apt-get", "install", "-y", "php8.3", "php8.3-fpm"])
+
+    @mock.patch("laravel_installer.privileged_helper.run_captured")
+    @mock.patch("laravel_installer.privileged_helper.run")
+    @mock.patch("laravel_installer.privileged_helper.packages_with_candidates", return_value={"php8.3"})
+    @mock.patch("laravel_installer.privileged_helper.apt_lists_age", return_value=60.0)
+    def test_install_packages_updates_when_candidate_is_missing(self, age_mock, candidates_mock, run_mock, captured_mock):
+        captured_mock.return_value = mock.Mock(returncode=0, stdout="", stderr="")
+        result = privileged_helper.install_packages({"packages": ["php8.3", "php8.3-fpm"]})
+        self.assertEqual(result, {"apt_update_skipped": False})
+        run_mock.assert_called_once_with(["apt-get", "update"])
+
+    @mock.patch("laravel_installer.privileged_helper.run_captured")
+    @mock.patch("laravel_installer.privileged_helper.run")
+    @mock.patch("laravel_installer.privileged_helper.packages_with_candidates", return_value={"php8.3"})
+    @mock.patch("laravel_installer.privileged_helper.apt_lists_age", return_value=60.0)
+    def test_install_packages_retries_after_unable_to_locate(self, age_mock, candidates_mock, run_mock, captured_mock):
+        captured_mock.return_value = mock.Mock(returncode=100, stdout="", stderr="E: Unable to locate package php8.3")
+        result = privileged_helper.install_packages({"packages": ["php8.3"]})
+        self.assertEqual(result, {"apt_update_skipped": False})
+        self.assertEqual(
+            run_mock.call_args_list,
+            [mock.call(["apt-get", "update"]), mock.call(["apt-get", "install", "-y", "php8.3"])],
+        )
+
+    def test_packages_with_candidates_parses_apt_cache_policy(self):
+        output = (
+            "php8.3:\n  Installed: (none)\n  Candidate: 8.3.6-0ubuntu0.24.04.1\n"
+            "php9.9-fpm:\n  Installed: (none)\n  Candidate: (none)\n"
+        )
+        with mock.patch("laravel_installer.privileged_helper.subprocess.run", return_value=mock.Mock(stdout=output)):
+            self.assertEqual(privileged_helper.packages_with_candidates(["php8.3", "php9.9-fpm"]), {"php8.3"})
+
+    def test_sync_hosts_entries_manages_one_block_atomically(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            hosts = Path(tmp) / "hosts"
+            hosts.write_text("127.0.0.1 localhost\n127.0.0.1 shop.testing\n\n127.0.0.1 blog.test\n", encoding="utf-8")
+            hosts.chmod(0o644)
+            with mock.patch.object(privileged_helper, "HOSTS_PATH", hosts):
+                result = privileged_helper.sync_hosts_entries({"hostnames": ["shop.test", "Blog.test"]})
+                self.assertEqual(result, {"changed": True, "added": ["blog.test", "shop.test"], "removed": []})
+                self.assertEqual(
+                    hosts.read_text(encoding="utf-8"),
+                    "127.0.0.1 localhost\n127.0.0.1 shop.testing\n\n"
+                    f"{privileged_helper.HOSTS_BLOCK_BEGIN}\n127.0.0.1 blog.test\n127.0.0.1 shop.test\n"
+                    f"{privileged_helper.HOSTS_BLOCK_END}\n",
+                )
+                self.assertEqual(hosts.stat().st_mode & 0o777, 0o644)
+                self.assertEqual(privileged_helper.ensure_hosts_entry({"hostname": "shop.test"})["changed"], False)
+
+                pruned = privileged_helper.sync_hosts_entries({"hostnames": ["shop.test"], "prune": True})
+                self.assertEqual(pruned["removed"], ["blog.test"])
+                self.assertNotIn("blog.test", hosts.read_text(encoding="utf-8"))
+                self.assertIn("shop.testing", hosts.read_text(encoding="utf-8"))
+                self.assertEqual(list(Path(tmp).iterdir()), [hosts])
+                with self.assertRaises(ValueError):
+                    privileged_helper.sync_hosts_entries({"hostnames": ["bad host"]})
+
     def test_link_public_dir_replaces_existing_symlink(self):
         with tempfile.TemporaryDirectory() as tmp:
             source = Path(tmp) / "source"
@@ -20,13 +94,55 @@ class PrivilegedHelperTests(unittest.TestCase):
             privileged_helper.link_public_dir({"source": str(source), "destination": str(destination)})
             self.assertTrue(destination.is_symlink())
 
-    @mock.patch("laravel_installer.privileged_helper.run")
-    def test_set_permissions_executes_expected_commands(self, run_mock):
+    def test_fix_tree_only_changes_entries_that_differ(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp) / "project"
+            (root / "app").mkdir(parents=True)
+            (root / "app" / "Kernel.php").write_text("<?php", encoding="utf-8")
+            (root / "vendor" / "pkg").mkdir(parents=True)
+            (root / "vendor" / "pkg" / "file.php").write_text("<?php", encoding="utf-8")
+            (root / "public").symlink_to(root / "app")
+            for path in (root, root / "app", root / "vendor", root / "vendor" / "pkg"):
+                path.chmod(0o755)
+            (root / "app" / "Kernel.php").chmod(0o644)
+            (root / "vendor" / "pkg" / "file.php").chmod(0o644)
+            uid, gid = os.getuid(), os.getgid()
+
+            first = privileged_helper.fix_tree(root, uid, gid, 0o775, exclude=["vendor/pkg"])
+            self.assertEqual(first, {"scanned": 5, "changed": 4})
+            self.assertEqual((root / "app" / "Kernel.php").stat().st_mode & 0o777, 0o775)
+            self.assertEqual((root / "vendor" / "pkg" / "file.php").stat().st_mode & 0o777, 0o644)
+
+            second = privileged_helper.fix_tree(root, uid, gid, 0o775, exclude=["vendor/pkg"])
+            self.assertEqual(second, {"scanned": 5, "changed": 0})
+
+    def test_fix_tree_limits_walk_to_writable_paths(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "storage" / "logs").mkdir(parents=True)
+            (root / "bootstrap" / "cache").mkdir(parents=True)
+            (root / "app").mkdir()
+            counts = privileged_helper.fix_tree(
+                root, os.getuid(), os.getgid(), 0o775, writable_paths=["storage", "bootstrap/cache", "missing"]
+            )
+            self.assertEqual(counts["scanned"], 4)
+            self.assertNotEqual((root / "app").stat().st_mode & 0o777, 0o775)
+
+    @mock.patch("laravel_installer.privileged_helper.fix_tree", return_value={"scanned": 1, "changed": 0})
+    @mock.patch("laravel_installer.privileged_helper.grp.getgrnam")
+    @mock.patch("laravel_installer.privileged_helper.pwd.getpwnam")
+    def test_set_permissions_resolves_owner_and_rejects_escaping_paths(self, getpwnam_mock, getgrnam_mock, fix_mock):
+        getpwnam_mock.return_value = mock.Mock(pw_uid=33)
+        getgrnam_mock.return_value = mock.Mock(gr_gid=1000)
         with tempfile.TemporaryDirectory() as tmp:
             path = Path(tmp)
-            privileged_helper.set_permissions({"path": str(path), "username": "emre"})
-            run_mock.assert_any_call(["chmod", "-R", "775", str(path)])
-            run_mock.assert_any_call(["chown", "-R", "www-data:emre", str(path)])
+            result = privileged_helper.set_permissions({"path": str(path), "username": "emre", "exclude": ["node_modules/"]})
+            self.assertEqual(result, {"scanned": 1, "changed": 0})
+            getpwnam_mock.assert_called_once_with("www-data")
+            getgrnam_mock.assert_called_once_with("emre")
+            fix_mock.assert_called_once_with(path, 33, 1000, 0o775, ["node_modules"], [])
+            with self.assertRaises(ValueError):
+                privileged_helper.set_permissions({"path": str(path), "username": "emre", "exclude": ["../etc"]})
 
     @mock.patch("laravel_installer.privileged_helper.run")
     def test_ensure_directory_owner_creates_and_chowns_directory(self, run_mock):
@@ -37,16 +153,76 @@ class PrivilegedHelperTests(unittest.TestCase):
             run_mock.assert_any_call(["chown", "-R", "emre:emre", str(path)])
             run_mock.assert_any_call(["chmod", "775", str(path)])
 
+    def _apache_tree(self, root: Path) -> None:
+        mods = root / "apache2" / "mods-available"
+        mods.mkdir(parents=True)
+        (mods / "proxy.load").write_text("LoadModule proxy_module mod_proxy.so\n", encoding="utf-8")
+        (mods / "proxy.conf").write_text("", encoding="utf-8")
+        (mods / "proxy_fcgi.load").write_text("# Depends: proxy\nLoadModule proxy_fcgi_module x.so\n", encoding="utf-8")
+        (mods / "setenvif.load").write_text("", encoding="utf-8")
+        (mods / "setenvif.conf").write_text("", encoding="utf-8")
+        (mods / "rewrite.load").write_text("", encoding="utf-8")
+        (root / "apache2" / "conf-available").mkdir()
+        (root / "apache2" / "conf-available" / "php8.3-fpm.conf").write_text("", encoding="utf-8")
+        (root / "apache2" / "sites-available").mkdir()
+
     @mock.patch("laravel_installer.privileged_helper.run")
-    @mock.patch("laravel_installer.privileged_helper.Path.exists", return_value=True)
-    def test_configure_apache_php_enables_expected_modules(self, exists_mock, run_mock):
-        privileged_helper.configure_apache_php({"php_version": "8.3"})
-        run_mock.assert_any_call(["a2enmod", "proxy_fcgi"])
-        run_mock.assert_any_call(["a2enmod", "setenvif"])
-        run_mock.assert_any_call(["a2enmod", "rewrite"])
-        run_mock.assert_any_call(["a2enconf", "php8.3-fpm"])
-        run_mock.assert_any_call(["systemctl", "enable", "--now", "php8.3-fpm"])
-        run_mock.assert_any_call(["systemctl", "enable", "--now", "apache2"])
+    def test_configure_apache_php_links_modules_natively(self, run_mock):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            self._apache_tree(root)
+            with mock.patch.object(privileged_helper, "APACHE_DIR", root / "apache2"), mock.patch.object(
+                privileged_helper, "APACHE_STATE_DIR", root / "state"
+            ):
+                result = privileged_helper.configure_apache_php({"php_version": "8.3"})
+                self.assertEqual(result, {"changed": True})
+                enabled = root / "apache2" / "mods-enabled"
+                self.assertEqual(
+                    sorted(path.name for path in enabled.iterdir()),
+                    ["proxy.conf", "proxy.load", "proxy_fcgi.load", "rewrite.load", "setenvif.conf", "setenvif.load"],
+                )
+                self.assertEqual(os.readlink(enabled / "proxy_fcgi.load"), "../mods-available/proxy_fcgi.load")
+                self.assertTrue((root / "apache2" / "conf-enabled" / "php8.3-fpm.conf").is_symlink())
+                self.assertTrue((root / "state" / "module" / "enabled_by_admin" / "proxy").exists())
+                run_mock.assert_any_call(["systemctl", "enable", "--now", "php8.3-fpm"])
+                run_mock.assert_any_call(["systemctl", "enable", "--now", "apache2"])
+                self.assertFalse(any(call.args[0][0].startswith("a2en") for call in run_mock.call_args_list))
+
+                self.assertEqual(privileged_helper.configure_apache_php({"php_version": "8.3"}), {"changed": False})
+
+    @mock.patch("laravel_installer.privileged_helper.run")
+    def test_configure_apache_php_enables_modules_once_for_many_versions(self, run_mock):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            self._apache_tree(root)
+            with mock.patch.object(privileged_helper, "APACHE_DIR", root / "apache2"), mock.patch.object(
+                privileged_helper, "APACHE_STATE_DIR", root / "state"
+            ):
+                privileged_helper.configure_apache_php({"php_versions": ["8.2", "8.3"]})
+                run_mock.assert_any_call(["systemctl", "enable", "--now", "php8.2-fpm"])
+                run_mock.assert_any_call(["systemctl", "enable", "--now", "php8.3-fpm"])
+                self.assertFalse((root / "apache2" / "conf-enabled" / "php8.2-fpm.conf").exists())
+                with self.assertRaises(ValueError):
+                    privileged_helper.configure_apache_php({"php_versions": ["8.2", ""]})
+
+    def test_enable_site_and_write_vhost_report_changes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            self._apache_tree(root)
+            with mock.patch.object(privileged_helper, "APACHE_DIR", root / "apache2"), mock.patch.object(
+                privileged_helper, "APACHE_STATE_DIR", root / "state"
+            ):
+                self.assertEqual(privileged_helper.write_vhost({"site_name": "shop", "content": "x"}), {"changed": True})
+                self.assertEqual(privileged_helper.write_vhost({"site_name": "shop", "content": "x"}), {"changed": False})
+                self.assertEqual(privileged_helper.enable_site({"site_name": "shop"}), {"changed": True})
+                self.assertEqual(privileged_helper.enable_site({"site_name": "shop"}), {"changed": False})
+                link = root / "apache2" / "sites-enabled" / "shop.conf"
+                link.unlink()
+                link.symlink_to("../sites-available/missing.conf")
+                self.assertEqual(privileged_helper.enable_site({"site_name": "shop"}), {"changed": True})
+                self.assertEqual(os.readlink(link), "../sites-available/shop.conf")
+                with self.assertRaises(ValueError):
+                    privileged_helper.enable_site({"site_name": "ghost"})
 
     def test_run_operations_dispatches_batch(self):
         install_mock = mock.Mock()
@@ -67,6 +243,43 @@ class PrivilegedHelperTests(unittest.TestCase):
         install_mock.assert_called_once_with({"packages": ["git"]})
         hosts_mock.assert_called_once_with({"hostname": "demo.test"})
 
+    def test_serve_answers_each_request_and_stops_on_eof(self):
+        hosts_mock = mock.Mock(return_value=None)
+        requests = io.StringIO(
+            "\n".join(
+                [
+                    json.dumps({"id": 1, "operation": "ensure_hosts_entry", "payload": {"hostname": "demo.test"}}),
+                    json.dumps({"id": 2, "operation": "install_packages", "payload": {"packages": "git"}}),
+                    json.dumps({"id": 3, "operation": "rm_rf", "payload": {}}),
+                ]
+            )
+            + "\n"
+        )
+        responses = io.StringIO()
+        with mock.patch.dict(privileged_helper.OPERATIONS, {"ensure_hosts_entry": hosts_mock}, clear=False):
+            privileged_helper.serve(requests, responses)
+        replies = [json.loads(line) for line in responses.getvalue().splitlines()]
+        self.assertEqual([reply["id"] for reply in replies], [1, 2, 3])
+        self.assertEqual([reply["ok"] for reply in replies], [True, False, False])
+        self.assertIn("unsupported operation", replies[2]["error"])
+        hosts_mock.assert_called_once_with({"hostname": "demo.test"})
+
+    def test_persistent_session_reuses_one_helper_process(self):
+        with mock.patch.dict(os.environ, {"PYTHONPATH": str(REPO_ROOT)}):
+            privileged = PrivilegedOperations(helper_command=[sys.executable, "-m", "laravel_installer.privileged_helper"])
+            try:
+                result = privileged.install_packages([])
+                self.assertEqual(privileged.operation_result(result), {"apt_update_skipped": True})
+                process = privileged._session._process
+                privileged.run_operations([])
+                self.assertIs(privileged._session._process, process)
+                with self.assertRaises(RuntimeError):
+                    privileged.run_operation("install_packages", {"packages": "git"})
+                self.assertTrue(privileged._session.alive)
+            finally:
+                privileged.close()
+            self.assertEqual(process.returncode, 0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,10 +1,52 @@
 import json
 import tempfile
+import threading
+import time
 import unittest
 from pathlib import Path
+from unittest import mock
 
+from benchmarks.fakes import FakeCommandRunner, FakeInspector, Latency, SimulatedSystem
+from benchmarks.fakes import FakePrivileged as SimulatedPrivileged
+from laravel_installer.config import StateStore
 from laravel_installer.installer import InstallerService
-from laravel_installer.models import ProjectConfig
+from laravel_installer.mirrors import MirrorCache
+from laravel_installer.models import CommandResult, ProjectConfig, ProjectExecution
+from laravel_installer.system import AsyncCommandRunner, CommandRunner, EnvironmentInspector
+
+
+class FakePrivileged:
+    """Applies publish operations to a temporary tree instead of the real system."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.batches: list[list[str]] = []
+        self.payloads: dict[str, dict] = {}
+
+    def run_operations(self, operations):
+        self.batches.append([item["operation"] for item in operations])
+        for item in operations:
+            payload = self.payloads[item["operation"]] = item["payload"]
+            if item["operation"] == "link_public_dir":
+                Path(payload["destination"]).unlink(missing_ok=True)
+                Path(payload["destination"]).symlink_to(Path(payload["source"]).resolve())
+            elif item["operation"] == "write_vhost":
+                (self.root / "apache" / "sites-available" / f"{payload['site_name']}.conf").write_text(payload["content"], encoding="utf-8")
+            elif item["operation"] == "enable_site":
+                link = self.root / "apache" / "sites-enabled" / f"{payload['site_name']}.conf"
+                link.unlink(missing_ok=True)
+                link.symlink_to(self.root / "apache" / "sites-available" / f"{payload['site_name']}.conf")
+            elif item["operation"] == "configure_apache_php":
+                (self.root / "apache" / "mods-enabled").mkdir(exist_ok=True)
+                for module in ("proxy_fcgi", "setenvif", "rewrite"):
+                    (self.root / "apache" / "mods-enabled" / f"{module}.load").touch()
+            elif item["operation"] == "sync_hosts_entries":
+                with (self.root / "hosts").open("a", encoding="utf-8") as handle:
+                    handle.writelines(f"127.0.0.1 {hostname}\n" for hostname in payload["hostnames"])
+        return CommandResult(command=[], returncode=0, stdout=json.dumps([None] * len(operations)), stderr="")
+
+    def operation_result(self, result):
+        return json.loads(result.stdout)
 
 
 class InstallerServiceTests(unittest.TestCase):
@@ -29,6 +71,437 @@ class InstallerServiceTests(unittest.TestCase):
         self.assertEqual(normalized.hostname, "my-api.test")
         self.assertEqual(normalized.target_dir, "/var/www/my-api")
 
+    def test_validate_project_keeps_clone_strategy_and_rejects_unknown_filters(self):
+        project = ProjectConfig(name="shop", repo_url="git@example.com:shop.git", clone_depth=1, clone_filter="blob:none", use_mirror=True)
+        normalized = self.service.validate_project(project, "/var/www")
+        self.assertEqual((normalized.clone_depth, normalized.clone_filter, normalized.use_mirror), (1, "blob:none", True))
+        project.clone_filter = "blob:none --upload-pack=evil"
+        with self.assertRaises(ValueError):
+            self.service.validate_project(project, "/var/www")
+
+    def test_execute_projects_runs_in_parallel_and_keeps_queue_order(self):
+        inspector = mock.Mock()
+        inspector.preflight_snapshot.return_value = {
+            "git": True,
+            "composer": True,
+            "apache2": True,
+            "pkexec": True,
+            "php_versions": ["8.2"],
+            "ubuntu_version": "24.04",
+        }
+        inspector.installed_php_versions.return_value = ["8.2"]
+        service = InstallerService(
+            runner=mock.Mock(), inspector=inspector, privileged=mock.Mock(), state=mock.Mock(), run_logs=mock.Mock()
+        )
+        service._is_package_missing = mock.Mock(return_value=False)
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def fake_prepare(project, execution, log_callback, resume=False):
+            nonlocal active, peak
+            execution.php_version = "8.2"
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+            if project.name == "beta":
+                raise RuntimeError("boom")
+
+        projects = [ProjectConfig(name=name, repo_url=f"git@example.com:{name}.git") for name in ("alpha", "beta", "gamma")]
+        with mock.patch.object(service, "_prepare_source", side_effect=fake_prepare), mock.patch.object(
+            service, "_install_dependencies"
+        ) as dependencies_mock, mock.patch.object(service, "_publish_site") as site_mock, mock.patch.object(
+            service, "_publish_permissions"
+        ), mock.patch.object(service, "_finalize_batch") as finalize_mock:
+            executions = service.execute_projects(projects, "/var/www", lambda *_: None, max_workers=3)
+
+        self.assertEqual([execution.project.name for execution in executions], ["alpha", "beta", "gamma"])
+        self.assertEqual([execution.failed for execution in executions], [False, True, False])
+        self.assertGreater(peak, 1)
+        self.assertEqual(dependencies_mock.call_count, 2)
+        self.assertEqual(site_mock.call_count, 2)
+        finalize_mock.assert_called_once()
+
+    def test_projects_ready_while_apt_is_busy_share_one_php_install(self):
+        inspector = mock.Mock()
+        inspector.preflight_snapshot.return_value = {
+            "git": True,
+            "composer": True,
+            "apache2": True,
+            "pkexec": True,
+            "php_versions": [],
+            "ubuntu_version": "24.04",
+        }
+        inspector.installed_php_versions.return_value = []
+        privileged = mock.Mock()
+        service = InstallerService(
+            runner=mock.Mock(), inspector=inspector, privileged=privileged, state=mock.Mock(), run_logs=mock.Mock()
+        )
+        service._is_package_missing = mock.Mock(return_value=True)
+        versions = {"alpha": "8.3", "beta": "8.1", "gamma": "8.2", "delta": "8.2"}
+        apt_busy = threading.Event()
+        all_sourced = threading.Event()
+        sourced = 0
+        lock = threading.Lock()
+
+        def fake_prepare(project, execution, log_callback, resume=False):
+            execution.php_version = versions[project.name]
+            if project.name != "alpha":
+                apt_busy.wait(timeout=5)
+
+        def source_step(*args):
+            nonlocal sourced
+            InstallerService._source_step(service, *args)
+            with lock:
+                sourced += 1
+                if sourced == len(versions):
+                    all_sourced.set()
+
+        def install_packages(packages, lists_max_age=None):
+            # The first apt run (alpha's) lasts until every other source is ready.
+            if not apt_busy.is_set():
+                apt_busy.set()
+                all_sourced.wait(timeout=5)
+
+        privileged.install_packages.side_effect = install_packages
+        projects = [ProjectConfig(name=name, repo_url=f"git@example.com:{name}.git") for name in versions]
+        with mock.patch.object(service, "_prepare_source", side_effect=fake_prepare), mock.patch.object(
+            service, "_source_step", side_effect=source_step
+        ), mock.patch.object(service, "_install_dependencies"), mock.patch.object(
+            service, "_publish_site"
+        ), mock.patch.object(service, "_publish_permissions"), mock.patch.object(service, "_finalize_batch"):
+            executions = service.execute_projects(
+                projects, "/var/www", lambda *_: None, max_workers=4, apt_lists_max_age=600
+            )
+
+        self.assertEqual(privileged.install_packages.call_count, 2)
+        for call in privileged.install_packages.call_args_list:
+            self.assertEqual(call.kwargs["lists_max_age"], 600)
+        first, grouped = (call.args[0] for call in privileged.install_packages.call_args_list)
+        self.assertIn("php8.3-fpm", first)
+        for version in ("8.1", "8.2"):
+            self.assertIn(f"php{version}-fpm", grouped)
+            self.assertIn(f"php{version}-mbstring", grouped)
+        self.assertEqual(len(grouped), len(set(grouped)))
+        for execution in executions:
+            self.assertIn("php_packages", [step.step for step in execution.steps])
+
+    def test_project_with_failing_composer_is_never_published(self):
+        class FailingComposer(FakeCommandRunner):
+            def run(self, command, cwd=None, check=True, on_output=None, timeout=None, resource=None):
+                if "install" in command and command[-1].endswith("bad"):
+                    time.sleep(0.05)
+                    return CommandResult(command=command, returncode=1, stdout="", stderr="Your requirements could not be resolved")
+                return super().run(command, cwd, check, on_output, timeout, resource)
+
+        with tempfile.TemporaryDirectory() as tmp, mock.patch("laravel_installer.installer.DEFAULT_HTML_DIR", Path(tmp) / "html"):
+            root = Path(tmp)
+            system = SimulatedSystem()
+            latency = Latency(scale=0)
+            runner = FailingComposer(system, latency)
+            service = InstallerService(
+                runner=runner,
+                inspector=FakeInspector(system),
+                privileged=SimulatedPrivileged(system, latency),
+                state=StateStore(root / "state.json"),
+                mirrors=MirrorCache(runner, root=root / "mirrors"),
+                run_logs=mock.Mock(),
+            )
+            projects = [ProjectConfig(name=name, repo_url=f"git@example.com:{name}.git") for name in ("good", "bad")]
+            executions = service.execute_projects(projects, str(root / "www"), lambda *_: None, max_workers=2)
+
+        self.assertEqual([execution.failed for execution in executions], [False, True])
+        self.assertEqual(system.enabled_sites, {"good"})
+        self.assertNotIn("bad", system.sites)
+        self.assertNotIn("bad.test", system.hosts)
+        self.assertEqual(system.reloads, 1)
+
+    def test_unchanged_rerun_reads_each_revision_once(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch("laravel_installer.installer.DEFAULT_HTML_DIR", Path(tmp) / "html"):
+            root = Path(tmp)
+            system = SimulatedSystem()
+            latency = Latency(scale=0)
+            runner = FakeCommandRunner(system, latency)
+            service = InstallerService(
+                runner=runner,
+                inspector=FakeInspector(system),
+                privileged=SimulatedPrivileged(system, latency),
+                state=StateStore(root / "state.json"),
+                mirrors=MirrorCache(runner, root=root / "mirrors"),
+                run_logs=mock.Mock(),
+            )
+            projects = [ProjectConfig(name=name, repo_url=f"git@example.com:{name}.git") for name in ("a", "b", "c")]
+            service.execute_projects(projects, str(root / "www"), lambda *_: None, max_workers=2)
+            system.reset_counters()
+            executions = service.execute_projects(projects, str(root / "www"), lambda *_: None, max_workers=2)
+
+        # One git pull and one rev-parse per project; composer and every publish step are skipped.
+        self.assertEqual(system.subprocesses, 2 * len(projects))
+        self.assertEqual(system.privileged_round_trips, 0)
+        for execution in executions:
+            self.assertEqual({step.step: step.status for step in execution.steps}["permissions"], "skipped")
+
+    def test_forced_retry_starts_over_instead_of_resuming(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch("laravel_installer.installer.DEFAULT_HTML_DIR", Path(tmp) / "html"):
+            root = Path(tmp)
+            system = SimulatedSystem()
+            latency = Latency(scale=0)
+            runner = FakeCommandRunner(system, latency)
+            service = InstallerService(
+                runner=runner,
+                inspector=FakeInspector(system),
+                privileged=SimulatedPrivileged(system, latency),
+                state=StateStore(root / "state.json"),
+                mirrors=MirrorCache(runner, root=root / "mirrors"),
+                run_logs=mock.Mock(),
+            )
+            projects = [ProjectConfig(name="a", repo_url="git@example.com:a.git")]
+            service.execute_projects(projects, str(root / "www"), lambda *_: None)
+            messages = []
+            with mock.patch.object(service.state, "clear_checkpoint", wraps=service.state.clear_checkpoint) as clear:
+                service.execute_projects(
+                    projects, str(root / "www"), lambda message, level="info": messages.append(message), force=True, resume=True
+                )
+
+        clear.assert_called_once_with("a")
+        self.assertIn("Starting a", messages)
+
+    def _ledger_service(self, tmp: str):
+        root = Path(tmp)
+        project_dir = root / "shop"
+        (project_dir / "vendor" / "composer").mkdir(parents=True)
+        (project_dir / "public").mkdir()
+        (project_dir / "composer.lock").write_text('{"packages": []}', encoding="utf-8")
+        (project_dir / "vendor" / "composer" / "installed.json").write_text('{"packages": []}', encoding="utf-8")
+        (root / "apache" / "sites-available").mkdir(parents=True)
+        (root / "apache" / "sites-enabled").mkdir()
+        (root / "html").mkdir()
+        (root / "hosts").write_text("127.0.0.1 localhost\n127.0.0.1 shop.testing\n", encoding="utf-8")
+        runner = mock.Mock()
+        runner.run.return_value = CommandResult(command=[], returncode=0, stdout="0123abcd\n", stderr="")
+        inspector = EnvironmentInspector(runner, apache_dir=root / "apache", hosts_path=root / "hosts")
+        inspector.path_owner = mock.Mock(return_value="www-data")
+        service = InstallerService(
+            runner=runner,
+            inspector=inspector,
+            privileged=FakePrivileged(root),
+            state=StateStore(root / "state.json"),
+        )
+        project = ProjectConfig(name="shop", repo_url="git@example.com:shop.git", hostname="shop.test", target_dir=str(project_dir))
+        return service, project
+
+    def _composer_runs(self, service) -> int:
+        return sum(1 for call in service.runner.run.call_args_list if "install" in call.args[0])
+
+    def _install_and_publish(self, service, project, execution, force=False):
+        """The dependencies, site and permissions tasks of one project, in an order the step graph allows."""
+        execution.revision = execution.revision or service._source_revision(Path(project.target_dir))
+        service._install_dependencies(project, execution, lambda *_: None, force=force)
+        service._publish_site(project, execution, lambda *_: None, force=force)
+        service._publish_permissions(project, execution, lambda *_: None, force=force)
+
+    def test_composer_install_is_skipped_when_fingerprint_matches(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch("laravel_installer.installer.DEFAULT_HTML_DIR", Path(tmp) / "html"):
+            service, project = self._ledger_service(tmp)
+
+            first = ProjectExecution(project=project, php_version="8.3")
+            self._install_and_publish(service, project, first)
+            self.assertEqual(self._composer_runs(service), 1)
+
+            second = ProjectExecution(project=project, php_version="8.3")
+            self._install_and_publish(service, project, second)
+            self.assertEqual(self._composer_runs(service), 1)
+            composer_step = next(step for step in second.steps if step.step == "composer")
+            self.assertEqual(composer_step.status, "skipped")
+
+            changed_php = ProjectExecution(project=project, php_version="8.4")
+            self._install_and_publish(service, project, changed_php)
+            self.assertEqual(self._composer_runs(service), 2)
+
+            forced = ProjectExecution(project=project, php_version="8.4")
+            self._install_and_publish(service, project, forced, force=True)
+            self.assertEqual(self._composer_runs(service), 3)
+
+    def test_composer_installs_share_the_composer_limit(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            script = root / "php"
+            script.write_text("#!/bin/sh\necho start\nsleep 0.1\necho end\n", encoding="utf-8")
+            script.chmod(0o755)
+            service = InstallerService(
+                runner=CommandRunner(AsyncCommandRunner(limits={"composer": 1})),
+                inspector=mock.Mock(),
+                privileged=mock.Mock(),
+                state=StateStore(root / "state.json"),
+                run_logs=mock.Mock(),
+            )
+            lock = threading.Lock()
+            running = [0, 0]
+
+            def log(message, level="info"):
+                if level != "cmd":
+                    return
+                with lock:
+                    running[0] += 1 if message.endswith(": start") else -1
+                    running[1] = max(running[1], running[0])
+
+            def install(name):
+                project = ProjectConfig(name=name, repo_url=f"git@example.com:{name}.git", target_dir=str(root / name))
+                service._install_dependencies(project, ProjectExecution(project=project, php_version="8.3"), log)
+
+            # The command starts with the PHP binary, so only the resource class ties it to the composer limit.
+            with mock.patch("laravel_installer.installer.shutil.which", return_value=str(script)):
+                threads = [threading.Thread(target=install, args=(name,)) for name in ("a", "b", "c")]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            service.state.compact()
+
+        self.assertEqual(running, [0, 1])
+
+    def test_steps_are_timed_back_to_back_with_command_resources(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch("laravel_installer.installer.DEFAULT_HTML_DIR", Path(tmp) / "html"):
+            service, project = self._ledger_service(tmp)
+            service.runner.run.return_value = CommandResult(
+                command=[], returncode=0, stdout="0123abcd\n", stderr="", cpu_seconds=1.5, max_rss_kb=2048
+            )
+            execution = ProjectExecution(project=project, php_version="8.3")
+            self._install_and_publish(service, project, execution)
+            for previous, step in zip(execution.steps, execution.steps[1:]):
+                self.assertEqual(step.started_at, previous.finished_at)
+            composer = next(step for step in execution.steps if step.step == "composer")
+            self.assertEqual((composer.cpu_seconds, composer.max_rss_kb), (1.5, 2048))
+            self.assertGreaterEqual(composer.duration, 0)
+
+    def test_publish_only_sends_steps_whose_inputs_or_state_changed(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch("laravel_installer.installer.DEFAULT_HTML_DIR", Path(tmp) / "html"):
+            service, project = self._ledger_service(tmp)
+            publish_ops = {"link_public_dir", "set_permissions", "write_vhost", "enable_site"}
+
+            self._install_and_publish(service, project, ProjectExecution(project=project, php_version="8.3"))
+            self.assertEqual(service.privileged.batches, [["link_public_dir", "write_vhost", "enable_site"], ["set_permissions"]])
+            self.assertEqual(set().union(*service.privileged.batches), publish_ops)
+            permissions = service.privileged.payloads["set_permissions"]
+            self.assertEqual(permissions["writable_paths"], ["storage", "bootstrap/cache"])
+            self.assertEqual(permissions["exclude"], ["vendor", "node_modules"])
+
+            batches_before = len(service.privileged.batches)
+            rerun = ProjectExecution(project=project, php_version="8.3")
+            self._install_and_publish(service, project, rerun)
+            self.assertEqual(len(service.privileged.batches), batches_before)
+            statuses = {step.step: step.status for step in rerun.steps}
+            for step in ("public_link", "permissions", "vhost", "site_enable"):
+                self.assertEqual(statuses[step], "skipped")
+
+            (Path(tmp) / "apache" / "sites-enabled" / "shop.conf").unlink()
+            self._install_and_publish(service, project, ProjectExecution(project=project, php_version="8.3"))
+            self.assertEqual(service.privileged.batches[-1], ["enable_site"])
+
+    def test_permissions_finishing_after_the_site_keeps_the_reload(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch("laravel_installer.installer.DEFAULT_HTML_DIR", Path(tmp) / "html"):
+            service, project = self._ledger_service(tmp)
+            first = ProjectExecution(project=project, php_version="8.3")
+            self._install_and_publish(service, project, first)
+            service._finalize_batch([first], lambda *_: None)
+            (Path(tmp) / "apache" / "sites-enabled" / "shop.conf").unlink()
+
+            execution = ProjectExecution(project=project, php_version="8.3")
+            execution.revision = first.revision
+            stale_reload = service.state.fingerprint(project.name, "apache_reload")
+            fingerprint = service.state.fingerprint
+            service._install_dependencies(project, execution, lambda *_: None)
+            service._publish_site(project, execution, lambda *_: None)
+            # The permissions task read the ledger before the site task forgot the reload fingerprint.
+            with mock.patch.object(
+                service.state,
+                "fingerprint",
+                side_effect=lambda name, step: stale_reload if step == "apache_reload" else fingerprint(name, step),
+            ):
+                service._publish_permissions(project, execution, lambda *_: None)
+            self.assertTrue(execution.apache_changed)
+            service._finalize_batch([execution], lambda *_: None)
+            self.assertIn("reload_apache", service.privileged.batches[-1])
+
+    def test_finalize_configures_each_php_version_and_reloads_once(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch("laravel_installer.installer.DEFAULT_HTML_DIR", Path(tmp) / "html"):
+            service, _ = self._ledger_service(tmp)
+
+            def executions():
+                return [
+                    ProjectExecution(
+                        project=ProjectConfig(name=name, repo_url="", hostname=f"{name}.test"),
+                        php_version=version,
+                        apache_changed=changed,
+                        apache_fingerprint=f"{name}-vhost",
+                    )
+                    for name, version, changed in (("a", "8.3", True), ("b", "8.2", False), ("c", "8.3", False))
+                ]
+
+            first = executions()
+            service._finalize_batch(first, lambda *_: None)
+            self.assertEqual(
+                service.privileged.batches,
+                [["sync_hosts_entries", "configure_apache_php", "apache_configtest", "ensure_service_running", "reload_apache"]],
+            )
+            self.assertEqual(service.inspector.hosts_entries() & {"a.test", "b.test", "c.test"}, {"a.test", "b.test", "c.test"})
+            for execution in first:
+                self.assertEqual({step.step: step.status for step in execution.steps}["publish"], "completed")
+
+            second = executions()
+            for execution in second:
+                execution.apache_changed = False
+            service._finalize_batch(second, lambda *_: None)
+            self.assertEqual(len(service.privileged.batches), 1)
+            self.assertEqual({step.step: step.status for step in second[0].steps}["apache_reload"], "skipped")
+
+    def test_finalize_skips_reload_when_helper_reports_no_change(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            service, project = self._ledger_service(tmp)
+            with (Path(tmp) / "hosts").open("a", encoding="utf-8") as handle:
+                handle.write("127.0.0.1 shop.test\n")
+            service.state.record("shop", "hosts", "shop.test")
+            privileged = mock.Mock()
+            privileged.run_operations.return_value = CommandResult(command=[], returncode=0, stdout="", stderr="")
+            privileged.operation_result.return_value = [{"changed": False}]
+            service.privileged = privileged
+            execution = ProjectExecution(project=project, php_version="8.3")
+            service._finalize_batch([execution], lambda *_: None)
+            privileged.run_operations.assert_called_once_with(
+                [{"operation": "configure_apache_php", "payload": {"php_versions": ["8.3"]}}]
+            )
+            self.assertEqual({step.step: step.status for step in execution.steps}["apache_reload"], "skipped")
+
+    def test_resume_skips_steps_completed_by_the_previous_attempt(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch("laravel_installer.installer.DEFAULT_HTML_DIR", Path(tmp) / "html"):
+            service, project = self._ledger_service(tmp)
+            log = lambda *_: None
+
+            first = ProjectExecution(project=project)
+            service._prepare_source(project, first, log)
+            first.php_version = "8.3"
+            self._install_and_publish(service, project, first)
+            pulls = [call for call in service.runner.run.call_args_list if call.args[0][-1] == "pull"]
+            self.assertEqual(len(pulls), 1)
+
+            resumed = ProjectExecution(project=project)
+            service._prepare_source(project, resumed, log, resume=True)
+            resumed.php_version = "8.3"
+            self._install_and_publish(service, project, resumed)
+            pulls = [call for call in service.runner.run.call_args_list if call.args[0][-1] == "pull"]
+            self.assertEqual(len(pulls), 1)
+            statuses = {step.step: step.status for step in resumed.steps}
+            self.assertEqual(statuses["git_pull"], "skipped")
+            self.assertEqual(len(service.privileged.batches), 2)
+
+            service.runner.run.return_value = CommandResult(command=[], returncode=0, stdout="fedc9876\n", stderr="")
+            moved = ProjectExecution(project=project)
+            service._prepare_source(project, moved, log, resume=True)
+            self.assertEqual({step.step: step.status for step in moved.steps}["git_pull"], "completed")
+
 
 if __name__ == "__main__":
     unittest.main()
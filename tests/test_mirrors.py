@@ -0,0 +1,112 @@
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from laravel_installer.installer import InstallerService
+from laravel_installer.mirrors import MirrorCache
+from laravel_installer.models import ProjectConfig, ProjectExecution
+from laravel_installer.system import CommandRunner
+
+
+def git(*args: str, cwd: Path | None = None) -> str:
+    completed = subprocess.run(
+        ["git", "-c", "user.name=Test", "-c", "user.email=test@example.com", *args],
+        cwd=cwd,
+        text=True,
+        capture_output=True,
+        check=True,
+    )
+    return completed.stdout.strip()
+
+
+class MirrorCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        work = self.root / "work"
+        work.mkdir()
+        git("init", "-q", "-b", "main", cwd=work)
+        for index in range(3):
+            (work / "composer.json").write_text(f'{{"require": {{"php": "^8.{index + 1}"}}}}', encoding="utf-8")
+            git("add", "composer.json", cwd=work)
+            git("commit", "-q", "-m", f"commit {index}", cwd=work)
+        self.work = work
+        self.upstream = self.root / "upstream.git"
+        git("clone", "-q", "--bare", str(work), str(self.upstream))
+        self.repo_url = self.upstream.as_uri()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_update_creates_mirror_then_fetches_new_commits(self):
+        cache = MirrorCache(CommandRunner(), root=self.root / "mirrors")
+        mirror = cache.update(self.repo_url)
+        self.assertEqual(mirror, cache.path_for(self.repo_url))
+        self.assertEqual(git("--git-dir", str(mirror), "rev-list", "--count", "main"), "3")
+
+        (self.work / "README.md").write_text("hello", encoding="utf-8")
+        git("add", "README.md", cwd=self.work)
+        git("commit", "-q", "-m", "readme", cwd=self.work)
+        git("push", "-q", str(self.upstream), "main", cwd=self.work)
+
+        self.assertEqual(cache.update(self.repo_url), mirror)
+        self.assertEqual(git("--git-dir", str(mirror), "rev-list", "--count", "main"), "4")
+
+    def test_prepare_source_uses_shallow_and_mirror_clones(self):
+        runner = CommandRunner()
+        service = InstallerService(
+            runner=runner,
+            inspector=mock.Mock(),
+            privileged=mock.Mock(),
+            state=mock.Mock(),
+            mirrors=MirrorCache(runner, root=self.root / "mirrors"),
+        )
+        shallow = ProjectConfig(
+            name="shallow",
+            repo_url=self.repo_url,
+            hostname="shallow.test",
+            target_dir=str(self.root / "shallow"),
+            clone_depth=1,
+        )
+        mirrored = ProjectConfig(
+            name="mirrored",
+            repo_url=self.repo_url,
+            hostname="mirrored.test",
+            target_dir=str(self.root / "mirrored"),
+            use_mirror=True,
+        )
+        for project in (shallow, mirrored):
+            execution = ProjectExecution(project=project)
+            service._prepare_source(project, execution, lambda *_: None)
+            self.assertEqual(execution.php_version, "8.3")
+
+        self.assertEqual(git("-C", str(self.root / "shallow"), "rev-list", "--count", "HEAD"), "1")
+        self.assertEqual(git("-C", str(self.root / "mirrored"), "rev-list", "--count", "HEAD"), "3")
+        self.assertTrue((self.root / "mirrors").joinpath(service.mirrors.path_for(self.repo_url).name).exists())
+        self.assertFalse((self.root / "mirrored" / ".git" / "objects" / "info" / "alternates").exists())
+
+    def test_clone_command_combines_strategies(self):
+        service = InstallerService(runner=mock.Mock(), inspector=mock.Mock(), privileged=mock.Mock(), state=mock.Mock())
+        project = ProjectConfig(name="shop", repo_url="git@example.com:shop.git", clone_depth=5, clone_filter="blob:none")
+        command = service.clone_command(project, Path("/var/www/shop"), Path("/cache/shop.git"))
+        self.assertEqual(
+            command,
+            [
+                "git",
+                "clone",
+                "--depth",
+                "5",
+                "--filter=blob:none",
+                "--reference",
+                "/cache/shop.git",
+                "--dissociate",
+                "git@example.com:shop.git",
+                "/var/www/shop",
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import gzip
+import tempfile
+import unittest
+from pathlib import Path
+
+from laravel_installer.runlog import RunLogStore
+
+
+class RunLogStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = RunLogStore(Path(self.tmp.name) / "runs", keep=2)
+
+    def test_run_log_is_written_compressed_and_replayed(self):
+        run_log = self.store.start()
+        run_log.emit("run_start", projects=["shop"])
+        run_log.emit("log", message="Starting shop", level="info")
+        run_log.emit("output", project="shop", line="Cloning into 'shop'...")
+        run_log.emit("command_end", project="shop", command=["git", "clone"], returncode=0)
+        path = run_log.close()
+
+        self.assertEqual(path.suffix, ".gz")
+        self.assertEqual(self.store.runs(), [path])
+        events = list(self.store.read(path))
+        self.assertEqual([event["event"] for event in events], ["run_start", "log", "output", "command_end"])
+        self.assertEqual(events[3]["returncode"], 0)
+        replayed: list[tuple[str, str]] = []
+        self.store.replay(path, lambda message, level: replayed.append((message, level)))
+        self.assertEqual(replayed, [("Starting shop", "info"), ("shop: Cloning into 'shop'...", "cmd")])
+
+    def test_rotation_keeps_newest_runs(self):
+        paths = []
+        for _ in range(3):
+            run_log = self.store.start()
+            run_log.emit("run_start", projects=[])
+            paths.append(run_log.close())
+        self.assertEqual(self.store.runs(), [paths[2], paths[1]])
+
+    def test_read_skips_a_truncated_last_line(self):
+        path = self.store.directory / "run-20250101-000000-000000.jsonl.gz"
+        self.store.directory.mkdir(parents=True)
+        with gzip.open(path, "wt", encoding="utf-8") as handle:
+            handle.write('{"event": "log", "message": "ok", "level": "info"}\n{"event": "lo')
+        self.assertEqual([event["message"] for event in self.store.read(path)], ["ok"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import threading
+import time
+import unittest
+
+from laravel_installer.scheduler import StepScheduler, Task
+
+
+class StepSchedulerTests(unittest.TestCase):
+    def test_dependencies_and_resource_limits_are_respected(self):
+        events: list[str] = []
+        active: dict[str, int] = {"apt": 0, "network": 0}
+        peak: dict[str, int] = {"apt": 0, "network": 0}
+        lock = threading.Lock()
+
+        def step(key: str, resource: str):
+            def run():
+                with lock:
+                    events.append(f"start {key}")
+                    active[resource] += 1
+                    peak[resource] = max(peak[resource], active[resource])
+                time.sleep(0.02)
+                with lock:
+                    active[resource] -= 1
+                    events.append(f"end {key}")
+
+            return run
+
+        tasks = []
+        for name in ("a", "b", "c"):
+            tasks.append(Task(f"{name}:clone", step(f"{name}:clone", "network"), (), ("network",)))
+            tasks.append(Task(f"{name}:apt", step(f"{name}:apt", "apt"), (f"{name}:clone",), ("apt",)))
+        StepScheduler({"network": 2, "apt": 1}, max_workers=4).run(tasks)
+
+        self.assertEqual(peak, {"apt": 1, "network": 2})
+        for name in ("a", "b", "c"):
+            self.assertLess(events.index(f"end {name}:clone"), events.index(f"start {name}:apt"))
+        # a's apt work overlaps the remaining clone instead of waiting for all clones.
+        self.assertLess(events.index("start a:apt"), events.index("end c:clone"))
+
+    def test_failure_skips_dependents_and_is_raised_after_the_rest(self):
+        ran: list[str] = []
+
+        def fail():
+            raise RuntimeError("clone failed")
+
+        tasks = [
+            Task("a:clone", fail),
+            Task("a:composer", lambda: ran.append("a:composer"), ("a:clone",)),
+            Task("b:clone", lambda: ran.append("b:clone")),
+            Task("finalize", lambda: ran.append("finalize"), ("b:clone",)),
+        ]
+        with self.assertRaisesRegex(RuntimeError, "clone failed"):
+            StepScheduler({}, max_workers=2).run(tasks)
+        self.assertEqual(sorted(ran), ["b:clone", "finalize"])
+
+    def test_invalid_graphs_are_rejected_before_running(self):
+        scheduler = StepScheduler({"apt": 1}, max_workers=1)
+        with self.assertRaisesRegex(ValueError, "cycle"):
+            scheduler.run([Task("a", lambda: None, ("b",)), Task("b", lambda: None, ("a",))])
+        with self.assertRaisesRegex(ValueError, "unknown"):
+            scheduler.run([Task("a", lambda: None, ("missing",))])
+        with self.assertRaisesRegex(ValueError, "capacity"):
+            scheduler.run([Task("a", lambda: None, (), ("cpu",))])
+
+
+if __name__ == "__main__":
+    unittest.main()
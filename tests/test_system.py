@@ -0,0 +1,171 @@
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from laravel_installer.system import AsyncCommandRunner, BoundedOutput, CommandRunner, EnvironmentInspector
+
+DPKG_STATUS = """Package: php8.3-cli
+Status: install ok installed
+Architecture: amd64
+Version: 8.3.6
+
+Package: php8.3-fpm
+Status: deinstall ok config-files
+Architecture: amd64
+
+Package: git
+Architecture: amd64
+Status: install ok installed
+"""
+
+
+class EnvironmentInspectorTests(unittest.TestCase):
+    def test_dpkg_index_reports_only_installed_packages(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            status_path = Path(tmp) / "status"
+            status_path.write_text(DPKG_STATUS, encoding="utf-8")
+            inspector = EnvironmentInspector(dpkg_status_path=status_path)
+            self.assertTrue(inspector.is_package_installed("php8.3-cli"))
+            self.assertTrue(inspector.is_package_installed("git:amd64"))
+            self.assertFalse(inspector.is_package_installed("php8.3-fpm"))
+            self.assertFalse(inspector.is_package_installed("composer"))
+
+    def test_dpkg_index_is_reparsed_when_status_file_changes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            status_path = Path(tmp) / "status"
+            status_path.write_text(DPKG_STATUS, encoding="utf-8")
+            inspector = EnvironmentInspector(dpkg_status_path=status_path)
+            first = inspector.installed_packages()
+            self.assertIs(inspector.installed_packages(), first)
+            status_path.write_text(DPKG_STATUS.replace("deinstall ok config-files", "install ok installed"), encoding="utf-8")
+            stat = status_path.stat()
+            os.utime(status_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+            self.assertTrue(inspector.is_package_installed("php8.3-fpm"))
+
+    def test_missing_dpkg_status_means_nothing_is_installed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            inspector = EnvironmentInspector(dpkg_status_path=Path(tmp) / "missing")
+            self.assertFalse(inspector.is_package_installed("git"))
+
+    def test_preflight_snapshot_is_cached_until_watched_paths_change(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            bin_dir = root / "bin"
+            bin_dir.mkdir()
+            (bin_dir / "php8.3").touch()
+            os_release = root / "os-release"
+            os_release.write_text('VERSION_ID="24.04"\n', encoding="utf-8")
+            inspector = EnvironmentInspector(
+                dpkg_status_path=root / "status", bin_dir=bin_dir, os_release_path=os_release
+            )
+            with mock.patch("laravel_installer.system.shutil.which", return_value="/usr/bin/git") as which:
+                first = inspector.preflight_snapshot()
+                self.assertEqual(first["php_versions"], ["8.3"])
+                self.assertEqual(first["ubuntu_version"], "24.04")
+                first["php_versions"].append("9.9")
+                self.assertEqual(inspector.installed_php_versions(), ["8.3"])
+                self.assertEqual(which.call_count, 4)
+                self.assertEqual(inspector.cache_stats(), {"hits": 1, "misses": 1})
+
+                (bin_dir / "php8.4").touch()
+                stat = bin_dir.stat()
+                os.utime(bin_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+                self.assertEqual(inspector.installed_php_versions(), ["8.3", "8.4"])
+                inspector.invalidate()
+                inspector.preflight_snapshot()
+                self.assertEqual(which.call_count, 12)
+                self.assertEqual(inspector.cache_stats(), {"hits": 1, "misses": 3})
+
+
+class CommandRunnerTests(unittest.TestCase):
+    def test_run_records_timing_cpu_and_peak_rss_of_the_child(self):
+        script = "import time\nblock = bytearray(64 * 1024 * 1024)\nend = time.process_time() + 0.2\nwhile time.process_time() < end:\n    pass"
+        result = CommandRunner().run([sys.executable, "-c", script])
+        self.assertGreaterEqual(result.finished_at - result.started_at, 0.2)
+        self.assertGreaterEqual(result.cpu_seconds, 0.15)
+        self.assertGreater(result.max_rss_kb, 64 * 1024)
+
+    def test_run_streams_every_line_and_keeps_bounded_output(self):
+        script = "import sys\nfor i in range(5000):\n    print(f'line {i}')\nprint('oops', file=sys.stderr)"
+        seen: list[str] = []
+        result = CommandRunner().run([sys.executable, "-c", script], on_output=seen.append)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(len(seen), 5001)
+        self.assertIn("oops", seen)
+        self.assertTrue(result.stdout.startswith("line 0\n"))
+        self.assertTrue(result.stdout.endswith("line 4999"))
+        self.assertIn("lines omitted", result.stdout)
+        self.assertLess(len(result.stdout.splitlines()), 120)
+        self.assertEqual(result.stderr, "oops")
+
+    def test_run_raises_with_output_summary_when_check_fails(self):
+        with self.assertRaises(RuntimeError) as ctx:
+            CommandRunner().run([sys.executable, "-c", "import sys; sys.exit('fatal: not a git repository')"])
+        self.assertIn("fatal: not a git repository", str(ctx.exception))
+
+    def test_run_splits_carriage_return_progress_into_lines(self):
+        seen: list[str] = []
+        result = CommandRunner().run(["printf", "10%%\\r50%%\\r\\ndone"], on_output=seen.append)
+        self.assertEqual(seen, ["10%", "50%", "done"])
+        self.assertEqual(result.stdout, "10%\n50%\ndone")
+
+    def test_cancel_terminates_running_commands(self):
+        runner = CommandRunner()
+        started = threading.Event()
+        errors: list[Exception] = []
+
+        def run():
+            try:
+                runner.run(["sh", "-c", "echo started; sleep 30"], on_output=lambda _line: started.set())
+            except RuntimeError as exc:
+                errors.append(exc)
+
+        worker = threading.Thread(target=run)
+        worker.start()
+        self.assertTrue(started.wait(5))
+        runner.cancel()
+        worker.join(5)
+        self.assertFalse(worker.is_alive())
+        self.assertIn("Command cancelled", str(errors[0]))
+
+    def test_bounded_output_truncates_long_lines(self):
+        buffer = BoundedOutput(head_lines=1, tail_lines=1, max_line_length=10)
+        for line in ("a" * 50, "b", "c", "d"):
+            buffer.append(line)
+        self.assertEqual(buffer.getvalue(), "aaaaaaa...\n... 2 lines omitted ...\nd")
+
+
+class AsyncCommandRunnerTests(unittest.TestCase):
+    def test_resource_limit_caps_concurrent_commands(self):
+        active = peak = 0
+
+        def track(line: str) -> None:
+            nonlocal active, peak
+            active += 1 if line == "start" else -1
+            peak = max(peak, active)
+
+        async def run_all():
+            runner = AsyncCommandRunner(limits={"sh": 2})
+            command = ["sh", "-c", "echo start; sleep 0.1; echo end"]
+            return await asyncio.gather(*(runner.run(command, on_output=track) for _ in range(5)))
+
+        results = asyncio.run(run_all())
+        self.assertEqual([result.returncode for result in results], [0] * 5)
+        self.assertEqual(peak, 2)
+
+    def test_timeout_kills_a_command_that_ignores_sigterm(self):
+        runner = AsyncCommandRunner(kill_grace=0.2)
+        started = time.monotonic()
+        with self.assertRaisesRegex(RuntimeError, "timed out after 0.2s"):
+            asyncio.run(runner.run(["sh", "-c", "trap '' TERM; sleep 30"], timeout=0.2))
+        self.assertLess(time.monotonic() - started, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from laravel_installer.trace import chrome_trace, command_name, write_chrome_trace
+
+EVENTS = [
+    {"ts": 100.0, "event": "run_start", "projects": ["shop", "blog"]},
+    {"ts": 100.1, "event": "command", "project": "shop", "command": ["git", "clone", "repo", "/var/www/shop"]},
+    {
+        "ts": 102.0,
+        "event": "command_end",
+        "project": "shop",
+        "command": ["git", "clone", "--depth", "1", "git@example.com:shop.git", "/var/www/shop"],
+        "returncode": 0,
+        "started_at": 100.1,
+        "finished_at": 102.0,
+        "cpu_seconds": 0.4,
+        "max_rss_kb": 9000,
+    },
+    {"ts": 102.0, "event": "step", "project_name": "shop", "step": "git_clone", "status": "completed",
+     "summary": "Repository cloned.", "started_at": 100.0, "finished_at": 102.0, "cpu_seconds": 0.4, "max_rss_kb": 9000},
+    {"ts": 101.0, "event": "step", "project_name": "blog", "step": "git_pull", "status": "completed",
+     "summary": "Repository updated.", "started_at": 100.5, "finished_at": 101.0, "cpu_seconds": 0.1, "max_rss_kb": 5000},
+    {"ts": 103.0, "event": "run_end", "failed": []},
+]
+
+
+class ChromeTraceTests(unittest.TestCase):
+    def test_projects_become_tracks_with_commands_nested_in_steps(self):
+        trace = chrome_trace(EVENTS)
+        spans = {event["name"]: event for event in trace["traceEvents"] if event["ph"] == "X"}
+        tracks = {event["args"]["name"]: event["tid"] for event in trace["traceEvents"] if event["ph"] == "M"}
+        self.assertEqual(tracks, {"shop": 1, "blog": 2})
+        self.assertEqual(spans["git_clone"]["ts"], 0)
+        self.assertEqual(spans["git_clone"]["dur"], 2_000_000)
+        self.assertEqual(spans["git clone"]["tid"], tracks["shop"])
+        self.assertEqual(spans["git clone"]["ts"], 100_000)
+        self.assertEqual(spans["git clone"]["args"]["max_rss_kb"], 9000)
+        self.assertEqual(spans["git_pull"]["tid"], tracks["blog"])
+        self.assertEqual([event["name"] for event in trace["traceEvents"] if event["ph"] == "i"], ["run_start", "run_end"])
+
+    def test_command_names_and_file_export(self):
+        self.assertEqual(command_name(["git", "-C", "/var/www/shop", "pull"]), "git pull")
+        self.assertEqual(command_name(["/usr/bin/php8.3", "/usr/bin/composer", "install", "--working-dir", "/x"]), "composer install")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "trace.json"
+            count = write_chrome_trace(EVENTS, path)
+            self.assertEqual(len(json.loads(path.read_text(encoding="utf-8"))["traceEvents"]), count)
+
+
+if __name__ == "__main__":
+    unittest.main()